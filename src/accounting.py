@@ -0,0 +1,112 @@
+import logging
+import quickfix as fix
+from fill_store import FillStore
+from positions import PositionEngine
+from order_store import OrderStore, PARTIAL, FILLED, CANCELED, REJECTED
+
+logger = logging.getLogger('logger')
+
+# ExecutionReport accounting shared by the live Application and the offline
+# replay: order book, positions, VWAP, volume, PnL and the fill history.
+# Works on decoded records only, no quickfix Message objects.
+
+class Accounting():
+    def __init__(self, symbols=(), history_size=10000):
+        self.orders = OrderStore(history_size)
+        self.positions = PositionEngine()
+        self.portfolio = self.positions.positions
+        self.total_volume = 0.0
+        self.vwap_data = {symbol: {"priceXvol": 0.0, "total_qty": 0, "vwap": 0.0} for symbol in symbols}
+        self.fills = FillStore()
+
+    def add_order(self, cl_ord_id, symbol, side, order_qty, price):
+        return self.orders.add(cl_ord_id, symbol, side, order_qty, price)
+
+    @property
+    def pnl(self):
+        return self.positions.realised
+
+    @property
+    def unrealised_pnl(self):
+        return self.positions.unrealised
+
+    def state(self):
+        # a copy, safe to pickle on another thread
+        return {"orders": self.orders.state(),
+                "positions": self.positions.state(),
+                "vwap_data": {symbol: dict(data) for symbol, data in self.vwap_data.items()},
+                "total_volume": self.total_volume,
+                "fills": self.fills.state()}
+
+    def restore(self, state):
+        # in place, the Application keeps references to these containers
+        self.orders.restore(state["orders"])
+        self.positions.restore(state["positions"])
+        self.vwap_data.clear()
+        self.vwap_data.update(state["vwap_data"])
+        self.total_volume = state["total_volume"]
+        self.fills.restore(state["fills"])
+
+    def apply(self, report, ts=None):
+        # returns (order ClOrdID, avg_px, leaves_qty, cum_qty), or None if the report has no symbol
+        exec_type = report.exec_type
+        cl_ord_id = report.cl_ord_id
+        symbol = report.symbol
+        side = report.side
+        order_qty = report.order_qty or 0
+        price = report.price or 0.0
+        ord_status = report.ord_status
+
+        last_px = report.last_px or 0.0
+        last_qty = report.last_shares
+        exec_qty = report.last_shares or 0
+
+        if not symbol:
+            return None
+
+        if symbol not in self.vwap_data:
+            self.vwap_data[symbol] = {"priceXvol": 0.0, "total_qty": 0, "vwap": 0.0}
+
+        if exec_type == fix.ExecType_REPLACED and report.orig_cl_ord_id in self.orders:
+            self.orders.replace(report.orig_cl_ord_id, cl_ord_id, report.order_qty, report.price)
+
+        order = self.orders.get_open(cl_ord_id)
+        self.orders.ack(cl_ord_id)
+        prev_cum_qty = order.cum_qty if order else 0
+
+        if last_px is not None and last_qty is not None:
+            cum_qty = prev_cum_qty + last_qty
+            leaves_qty = max(0, order_qty - cum_qty)
+
+            prev_avg_px = order.avg_px if order else 0
+            avg_px = ((prev_cum_qty * prev_avg_px) + (last_qty * last_px)) / cum_qty if cum_qty > 0 else price
+        else:
+            cum_qty = prev_cum_qty
+            leaves_qty = max(0, order_qty - cum_qty)
+            avg_px = order.avg_px if order else price
+
+        target = cl_ord_id
+        if ord_status in [fix.OrdStatus_CANCELED, fix.OrdStatus_REJECTED]:
+            # cancel acks carry the cancel request's ClOrdID, the order is OrigClOrdID
+            if report.orig_cl_ord_id in self.orders:
+                target = report.orig_cl_ord_id
+            self.orders.update(target, CANCELED if ord_status == fix.OrdStatus_CANCELED else REJECTED)
+            return target, avg_px, leaves_qty, cum_qty
+
+        if ord_status not in [fix.OrdStatus_PARTIALLY_FILLED, fix.OrdStatus_FILLED]:
+            return target, avg_px, leaves_qty, cum_qty
+
+        state = FILLED if ord_status == fix.OrdStatus_FILLED else PARTIAL
+        if order is not None and self.orders.update(cl_ord_id, state, cum_qty, leaves_qty, avg_px) is None:
+            logger.warning(f"Ignoring {state} transition for ClOrdID={cl_ord_id} in state {order.state}")
+
+        if exec_type in [fix.ExecType_PARTIAL_FILL, fix.ExecType_FILL]:
+            self.positions.fill(symbol, side, exec_qty, last_px)
+            self.fills.append(symbol, side, exec_qty, last_px, ts)
+
+            self.vwap_data[symbol]["priceXvol"] += last_px * exec_qty
+            self.vwap_data[symbol]["total_qty"] += exec_qty
+            self.vwap_data[symbol]["vwap"] = self.vwap_data[symbol]["priceXvol"] / self.vwap_data[symbol]["total_qty"] if self.vwap_data[symbol]["total_qty"] > 0 else 0.0
+
+            self.total_volume += last_px * exec_qty
+        return target, avg_px, leaves_qty, cum_qty
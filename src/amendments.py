@@ -0,0 +1,83 @@
+# Cancel and cancel/replace requests in flight. At most one request is pending
+# per order; another cancel or amend for it is suppressed until the request is
+# acknowledged or rejected. Requests are indexed both by their own ClOrdID and
+# by the order's, so acks and OrderCancelRejects (which carry the request
+# ClOrdID) find the original order in O(1). The MsgSeqNum each request went out
+# with is kept too, a session Reject (35=3) only identifies it by RefSeqNum.
+
+PENDING_CANCEL = "PENDING_CANCEL"
+PENDING_REPLACE = "PENDING_REPLACE"
+
+class AmendmentRequest():
+    __slots__ = ("cl_ord_id", "orig_cl_ord_id", "kind", "order_qty", "price", "seq_num")
+
+    def __init__(self, cl_ord_id, orig_cl_ord_id, kind, order_qty=None, price=None):
+        self.cl_ord_id = cl_ord_id
+        self.orig_cl_ord_id = orig_cl_ord_id
+        self.kind = kind
+        self.order_qty = order_qty
+        self.price = price
+        self.seq_num = None
+
+    def __repr__(self):
+        return f"AmendmentRequest({self.kind} {self.cl_ord_id} for {self.orig_cl_ord_id})"
+
+class AmendmentTracker():
+    def __init__(self):
+        self.by_order = {}
+        self.by_request = {}
+        self.by_seq = {}
+        self.suppressed = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.by_request)
+
+    def pending(self, orig_cl_ord_id):
+        return self.by_order.get(orig_cl_ord_id)
+
+    def begin(self, cl_ord_id, orig_cl_ord_id, kind, order_qty=None, price=None):
+        request = AmendmentRequest(cl_ord_id, orig_cl_ord_id, kind, order_qty, price)
+        self.by_order[orig_cl_ord_id] = request
+        self.by_request[cl_ord_id] = request
+        return request
+
+    def sent(self, cl_ord_id, seq_num):
+        request = self.by_request.get(cl_ord_id)
+        if request is not None:
+            request.seq_num = seq_num
+            self.by_seq[seq_num] = request
+
+    def resolve(self, cl_ord_id):
+        # the request was acknowledged or rejected, returns it or None if unknown
+        request = self.by_request.pop(cl_ord_id, None)
+        if request is not None:
+            self.by_order.pop(request.orig_cl_ord_id, None)
+            self.by_seq.pop(request.seq_num, None)
+        return request
+
+    def resolve_seq(self, seq_num):
+        # the session rejected the message sent with this MsgSeqNum
+        request = self.by_seq.pop(seq_num, None)
+        if request is None or self.by_request.get(request.cl_ord_id) is not request:
+            return None
+        return self.resolve(request.cl_ord_id)
+
+    def expire(self):
+        # the session was reset, requests sent in it will never be answered and
+        # the MsgSeqNums they went out with are reused; returns how many expired
+        expired = len(self.by_request)
+        self.by_order.clear()
+        self.by_request.clear()
+        self.by_seq.clear()
+        self.expired += expired
+        return expired
+
+    def discard_order(self, orig_cl_ord_id):
+        # the order finished (filled, rejected) before its request was answered
+        request = self.by_order.pop(orig_cl_ord_id, None)
+        if request is not None:
+            self.by_request.pop(request.cl_ord_id, None)
+            self.by_seq.pop(request.seq_num, None)
+        return request
@@ -1,32 +1,96 @@
 import sys
+import signal
 import quickfix as fix
 import time
 import logging
-from datetime import datetime
+import threading
 from model.logger import setup_logger
+from model.journal import Journal
+from model.stats_surface import StatsSurface
+from model.state_store import StateStore
 import random
 import argparse
-from helper import extract_message_field_value
+from decoder import decode_execution_report, record_values, record_from_values
 from execution_report import execution_report
+from scheduler import OrderScheduler
+from accounting import Accounting
+from latency import LatencyTracker
+from console import Console, LEVELS, ORDERS
+from ring_buffer import Worker, BLOCK, SPILL
+from registry import MessageRegistry, load_schema
+from amendments import AmendmentTracker, PENDING_CANCEL, PENDING_REPLACE
+from templates import (ClOrdIDGenerator, TimestampFormatter, NewOrderSingleTemplate, OrderCancelRequestTemplate,
+                       OrderCancelReplaceRequestTemplate)
 __SOH__ = chr(1)
+SYMBOLS = ["MSFT", "AAPL", "BAC"]
+# tags parse_ExecutionReport relies on, on top of the ones FIX42.xml requires
+EXECUTION_REPORT_REQUIRED = (54, 55, 38, 40, 44, 6, 150, 151, 14, 37)
+AMENDMENT_MSG_TYPES = (fix.MsgType_OrderCancelRequest, fix.MsgType_OrderCancelReplaceRequest)
+SESSION_REJECT = f"{__SOH__}35={fix.MsgType_Reject}{__SOH__}"
 
-#setup logger
-setup_logger('logger', 'log/message.log')
 logger = logging.getLogger('logger')
 
 class Application(fix.Application):
-    def __init__(self):
+    def __init__(self, stats_name="market_stats", inbox_capacity=65536, inbox_overflow=SPILL, spec_path="spec/FIX42.xml",
+                 state_dir="state", verbosity=ORDERS, stats_interval=1.0, journal_path="log/journal.log"):
         super().__init__()
+        self.started = time.perf_counter()
+        self.journal = Journal(journal_path)
         self.ClOrdID = 0
         self.order_count = 0
-        self.open_orders = {}
         self.sessionID = None
-        self.order_book = {}
-        self.portfolio = {}
-        self.total_volume = 0.0
-        self.vwap_data = {"MSFT": {"priceXvol": 0.0, "total_qty": 0, "vwap": 0.0},
-                          "AAPL": {"priceXvol": 0.0, "total_qty": 0, "vwap": 0.0},
-                          "BAC": {"priceXvol": 0.0, "total_qty": 0, "vwap": 0.0}}
+        self.scheduler = None
+        self.accounting = Accounting(SYMBOLS)
+        self.orders = self.accounting.orders
+        self.portfolio = self.accounting.portfolio
+        self.vwap_data = self.accounting.vwap_data
+        self.fills = self.accounting.fills
+        self.clordids = ClOrdIDGenerator()
+        self.timestamps = TimestampFormatter()
+        self.new_order_template = NewOrderSingleTemplate()
+        self.cancel_template = OrderCancelRequestTemplate()
+        self.replace_template = OrderCancelReplaceRequestTemplate()
+        self.amendments = AmendmentTracker()
+        self.latency = LatencyTracker()
+        self.console = Console(verbosity, stats_interval)
+        self.stats = StatsSurface(f"{stats_name}.shm", snapshot_path=stats_name)
+
+        self.registry = MessageRegistry(load_schema(spec_path))
+        self.registry.register(fix.MsgType_ExecutionReport, self.on_execution_report, EXECUTION_REPORT_REQUIRED)
+        self.registry.register(fix.MsgType_OrderCancelReject, self.on_order_cancel_reject)
+        self.registry.register(fix.MsgType_Reject, self.on_session_reject)
+
+        # all order book and portfolio state is owned by the worker thread
+        self.worker = Worker()
+        # session events come first, a reconnect is reconciled before the new session's reports and sends
+        self.session_events = self.worker.add_source(64, BLOCK, self.run_command)
+        self.inbox = self.worker.add_source(inbox_capacity, inbox_overflow, self.process_message)
+        self.commands = self.worker.add_source(1024, BLOCK, self.run_command)
+
+        # orders, positions, VWAP and fills survive a restart
+        self.state_store = StateStore(state_dir)
+        self.state_store.recover(self.accounting.restore, self.replay_delta)
+        self.state_store.start()
+        # reports for orders sent before the restart are not coming, the backlog would never drain
+        expired = self.orders.expire_unacked()
+        if expired:
+            logger.warning(f"{expired} recovered orders were never acknowledged, no longer counted as in flight")
+        self.warm_up()
+        self.worker.start()
+
+        # set by onLogon and cleared by onLogout; a reconnect keeps all state above
+        self.logged_on = threading.Event()
+        self.logon_at = None
+        self.logout_at = None
+        self.first_order_pending = False
+
+    @property
+    def total_volume(self):
+        return self.accounting.total_volume
+
+    @property
+    def pnl(self):
+        return self.accounting.pnl
 
     def onCreate(self, sessionID):
         sessionID = sessionID
@@ -35,140 +99,223 @@ class Application(fix.Application):
 
     def onLogon(self, sessionID):
         self.sessionID = sessionID
+        self.logon_at = time.perf_counter()
+        self.first_order_pending = True
+        if self.logout_at is None:
+            logger.info(f"Logon {round(self.logon_at - self.started, 3)} s after start")
+        else:
+            logger.info(f"Logon {round(self.logon_at - self.logout_at, 3)} s after logout")
+            self.session_events.put((self.reconcile, ()))
+        self.logged_on.set()
         print("Successful Logon to session '%s'." % sessionID.toString())
         return
 
     def onLogout(self, sessionID):
+        self.logged_on.clear()
+        self.logout_at = time.perf_counter()
         print("Session (%s) logout !" % sessionID.toString())
         return
 
+    def reconcile(self):
+        # worker thread, after a reconnect; with ResetOnLogon=Y nothing sent in the
+        # previous session will be answered
+        orders = self.orders.expire_unacked()
+        amendments = self.amendments.expire()
+        if orders or amendments:
+            logger.warning(f"Reconnect: {orders} unacknowledged orders and {amendments} pending amendments "
+                           f"from the previous session expired")
+
+    def wait_for_logon(self, timeout=None):
+        return self.logged_on.wait(timeout)
+
+    def warm_up(self):
+        # first use of the templates, timestamp formatting, strptime and the
+        # registry happens here rather than on the first order after logon
+        transact_time = self.timestamps.now()
+        message = self.new_order_template.build("WARMUP", fix.Side_BUY, SYMBOLS[0], 1, fix.OrdType_LIMIT, 1.0, transact_time)
+        raw = message.toString()
+        self.cancel_template.build("WARMUP-C", "WARMUP", SYMBOLS[0], fix.Side_BUY, transact_time).toString()
+        self.replace_template.build("WARMUP-R", "WARMUP", SYMBOLS[0], fix.Side_BUY, 1, fix.OrdType_LIMIT, 1.0,
+                                    transact_time).toString()
+        report = decode_execution_report(raw)
+        self.registry.get(fix.MsgType_ExecutionReport).missing(raw)
+        return report
+
+    def record_first_order(self):
+        self.first_order_pending = False
+        now = time.perf_counter()
+        if self.logout_at is None:
+            logger.info(f"First order {round(now - self.logon_at, 6)} s after logon, "
+                        f"{round(now - self.started, 3)} s after start")
+        else:
+            logger.info(f"First order {round(now - self.logon_at, 6)} s after reconnect, "
+                        f"{round(now - self.logout_at, 3)} s after logout")
+
     def toAdmin(self, message, sessionID):
-        msg = message.toString().replace(__SOH__, "|")
-        logger.info("(Server) S >> %s" % msg)
+        self.journal.record("AS", message.toString())
         return
     def fromAdmin(self, message, sessionID):
-        msg = message.toString().replace(__SOH__, "|")
-        logger.info("(Server) R << %s" % msg)
+        raw = message.toString()
+        self.journal.record("AR", raw)
+        # session Rejects can answer our cancels and replaces, the worker matches them up
+        if SESSION_REJECT in raw:
+            self.inbox.put((raw, time.perf_counter_ns(), time.time_ns()))
         return
     def toApp(self, message, sessionID):
-        msg = message.toString().replace(__SOH__, "|")
-        logger.info("(Client) S >> %s" % msg)
+        self.journal.record("S", message.toString())
+        sending = self.latency.sending
+        if sending is not None:
+            self.latency.record(sending[0], "toApp", time.perf_counter_ns() - sending[1])
+            # sendToTarget calls back on the sending thread with MsgSeqNum already set
+            if sending[0] in AMENDMENT_MSG_TYPES:
+                self.amendments.sent(message.getField(11), int(message.getHeader().getField(34)))
         return
     def fromApp(self, message, sessionID):
-        msg = message.toString().replace(__SOH__, "|")
-        logger.info("(Client) R << %s" % msg)
+        # quickfix's session thread only journals and hands off, the worker does the rest
+        received = time.perf_counter_ns()
+        received_wall = time.time_ns()
+        raw = message.toString()
+        self.journal.record("R", raw)
         self.onMessage(message, sessionID)
-        msgType = fix.MsgType()
-        message.getHeader().getField(msgType)
-
-        sending_time = extract_message_field_value(fix.SendingTime(), message, 'datetime')
-
-        if msgType.getValue() == fix.MsgType_ExecutionReport:
-            self.parse_ExecutionReport(message, sessionID)
-
-        required_fields = [fix.Side(),
-                           fix.Symbol(),
-                           fix.OrderQty(),
-                           fix.OrdType(),
-                           fix.Price(),
-                           fix.AvgPx(),
-                           fix.ExecType(),
-                           fix.LeavesQty(),
-                           fix.CumQty(),
-                           fix.OrderID()]
-        
-        missing_fields = [name for name in required_fields if not message.isSetField(name)]
-        if missing_fields:
-            self.log_missing_fields(message, missing_fields)
+        self.inbox.put((raw, received, received_wall))
+
+    def process_message(self, item):
+        self.latency.profile(self.handle_app_message, *item)
+
+    def handle_app_message(self, raw, received, received_wall):
+        dequeued = time.perf_counter_ns()
+        report = decode_execution_report(raw)
+        decoded = time.perf_counter_ns()
+        self.latency.record(report.msg_type, "queue", dequeued - received)
+        self.latency.record(report.msg_type, "decode", decoded - dequeued)
+        self.latency.inbound(report.msg_type, report.cl_ord_id, received, received_wall,
+                             report.sending_time, report.transact_time)
+
+        route = self.registry.get(report.msg_type)
+        if route is None:
+            logger.warning(f"No handler for MsgType {report.msg_type}")
             return
-
-        elif msgType == fix.MsgType_OrderCancelReject:
-            ClOrdID = extract_message_field_value(fix.ClOrdID(), message)
-            logger.error(f"Order Cancel Reject received for ClOrdID: {ClOrdID}")
-        return
+        report.missing = route.missing(raw)
+        route.handler(report)
+        self.latency.record(report.msg_type, "parse", time.perf_counter_ns() - decoded)
+
+        if report.missing:
+            self.log_missing_fields(report, report.missing)
+
+    def on_execution_report(self, report):
+        self.parse_ExecutionReport(None, self.sessionID, report)
+
+    def on_order_cancel_reject(self, report):
+        # the reject carries the request's ClOrdID, report it against the original order
+        request = self.amendments.resolve(report.cl_ord_id)
+        self.amendments.rejected += 1
+        orig_cl_ord_id = request.orig_cl_ord_id if request else report.orig_cl_ord_id
+        kind = request.kind if request else self.registry.schema.value_name(434, report.cxl_rej_response_to)
+        reason = self.registry.schema.value_name(102, report.cxl_rej_reason) if report.cxl_rej_reason else None
+        logger.error(f"Order Cancel Reject received for ClOrdID: {orig_cl_ord_id} ({kind} {report.cl_ord_id}), "
+                     f"order: {self.orders.get(orig_cl_ord_id)}, reason: {reason}, text: {report.text}")
+        if self.console.orders:
+            print(f"Order Cancel Reject: ClOrdID={orig_cl_ord_id}, request={report.cl_ord_id}, reason={reason}")
+
+    def on_session_reject(self, report):
+        request = None
+        if report.ref_msg_type in AMENDMENT_MSG_TYPES or report.ref_msg_type is None:
+            request = self.amendments.resolve_seq(report.ref_seq_num)
+        reason = self.registry.schema.value_name(373, report.session_reject_reason) if report.session_reject_reason else None
+        if request is None:
+            logger.error(f"Session Reject of MsgSeqNum {report.ref_seq_num} (MsgType {report.ref_msg_type}), "
+                         f"reason: {reason}, text: {report.text}")
+            return
+        self.amendments.rejected += 1
+        logger.error(f"Session Reject of {request.kind} {request.cl_ord_id} for ClOrdID: {request.orig_cl_ord_id}, "
+                     f"reason: {reason}, text: {report.text}")
+        if self.console.orders:
+            print(f"Session Reject: ClOrdID={request.orig_cl_ord_id}, request={request.cl_ord_id}, reason={reason}")
 
     def onMessage(self, message, sessionID):
         pass
 
+    def submit(self, fn, *args):
+        # run fn on the worker thread, called from the order window's thread
+        self.commands.put((fn, args))
+
+    def run_command(self, item):
+        fn, args = item
+        fn(*args)
+
+    def stop(self):
+        self.worker.stop()
+        self.state_store.snapshot(self.accounting.state())
+        self.state_store.close()
+        self.latency.stop()
+        self.journal.close()
+        self.stats.close()
+
+    def record_delta(self, kind, data):
+        # worker thread only, like the state it describes
+        self.state_store.record(kind, data)
+        if self.state_store.due():
+            self.state_store.snapshot(self.accounting.state())
+
+    def replay_delta(self, kind, data):
+        if kind == fix.MsgType_NewOrderSingle:
+            self.accounting.add_order(*data)
+        elif kind == fix.MsgType_ExecutionReport:
+            values, ts = data
+            self.accounting.apply(record_from_values(values), ts)
+
+    def queue_metrics(self):
+        return {"inbox": self.inbox.metrics(), "commands": self.commands.metrics(),
+                "session_events": self.session_events.metrics()}
+
     def genClOrdID(self):
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")[:-3]
-        return timestamp
+        return self.clordids.next()
     
-    def log_missing_fields(self, message, required_fields):
-        FIX_FIELD_NAMES = {
-            6: "AvgPx",
-            14: "CumQty",
-            38: "OrderQty",
-            40: "OrdType",
-            44: "Price",
-            151: "LeavesQty"
-        }
-
-        field_info = []
-        for field in required_fields:
-            try:
-                #get the tag and name of the field
-                tag = field.getTag()
-                name = FIX_FIELD_NAMES.get(tag, "Unknown")
-                field_info.append(f"{tag}={name}")
-            except Exception as e:
-                logger.error(f"Error in extracting field info: {e}")
-                print(f"Error in extracting field info: {e}")
-        
-        missing_fields = ", ".join(field_info)
+    def log_missing_fields(self, message, missing_tags):
+        missing_fields = self.registry.describe(missing_tags)
         logger.warning(f"Missing fields in message: {missing_fields}")
     
-    def parse_ExecutionReport(self, message, sessionID):
-        raw_message = message.toString().replace(__SOH__, "|")
-        print(f"Debug: {raw_message}")
-
-        exec_type = extract_message_field_value(fix.ExecType(), message, 'str')
-        cl_ord_id = extract_message_field_value(fix.ClOrdID(), message, 'str')
-        order_id = extract_message_field_value(fix.OrderID(), message, 'str')
-        symbol = extract_message_field_value(fix.Symbol(), message, 'str')
-        side = extract_message_field_value(fix.Side(), message, 'str')
-        order_qty = extract_message_field_value(fix.OrderQty(), message, 'int') or 0
-        price = extract_message_field_value(fix.Price(), message, 'float') or 0.0 
-        ord_status = extract_message_field_value(fix.OrdStatus(), message, 'str')
-        OrdType = extract_message_field_value(fix.OrdType(), message, 'str')
-        MinQty = extract_message_field_value(fix.MinQty(), message, 'int')
-
-        last_px = extract_message_field_value(fix.LastPx(), message, 'float') or 0.0
-        last_qty = extract_message_field_value(fix.LastQty(), message, 'int')
-        exec_qty = extract_message_field_value(fix.LastShares(), message, 'int') or 0
-
-        if not symbol:
+    def parse_ExecutionReport(self, message, sessionID, report=None):
+        if report is None:
+            report = decode_execution_report(message.toString())
+        console = self.console
+        if console.debug:
+            raw_message = report.raw.replace(__SOH__, "|")
+            print(f"Debug: {raw_message}")
+
+        exec_type = report.exec_type
+        cl_ord_id = report.cl_ord_id
+        order_id = report.order_id
+        symbol = report.symbol
+        side = report.side
+        order_qty = report.order_qty or 0
+        price = report.price or 0.0
+        ord_status = report.ord_status
+        OrdType = report.ord_type
+        MinQty = report.min_qty
+
+        ts = time.time_ns()
+        result = self.accounting.apply(report, ts)
+        self.record_delta(fix.MsgType_ExecutionReport, (record_values(report), ts))
+        if result is None:
             return
+        target, avg_px, leaves_qty, cum_qty = result
 
-        if symbol not in self.portfolio:
-            self.portfolio[symbol] = {"position": 0, "avg_price": 0.0, "PnL": 0.0, "unrealised_PnL": 0.0}
-
-        if symbol not in self.vwap_data:
-            self.vwap_data[symbol] = {"priceXvol": 0.0, "total_qty": 0, "vwap": 0.0}
+        if self.amendments:
+            if exec_type in (fix.ExecType_CANCELED, fix.ExecType_REPLACED):
+                self.amendments.resolve(cl_ord_id)
+            if target not in self.orders:
+                self.amendments.discard_order(target)
 
-        if ord_status in [fix.OrdStatus_FILLED, fix.OrdStatus_PARTIALLY_FILLED]:
-            if exec_type == fix.ExecType_FILL:
-                self.portfolio[symbol]["position"] += exec_qty if side == fix.Side_BUY else -exec_qty
-                self.portfolio[symbol]["avg_price"] = (self.portfolio[symbol]["avg_price"] + last_px) / self.portfolio[symbol]["position"]
-                if side == fix.Side_SELL:
-                    self.portfolio[symbol]["PnL"] += (last_px - price) * exec_qty
-                self.portfolio[symbol]["unrealised_PnL"] = (last_px - self.portfolio[symbol]["avg_price"]) * self.portfolio[symbol]["position"]
-
-        prev_cum_qty = self.order_book.get(cl_ord_id, {}).get("cum_qty", 0) or 0
-
-        if last_px is not None and last_qty is not None:
-            cum_qty = prev_cum_qty + last_qty
-            leaves_qty = max(0, order_qty - cum_qty)
-
-            prev_avg_px = self.order_book.get(cl_ord_id, {}).get("avg_px", 0) or 0
-            avg_px = ((prev_cum_qty * prev_avg_px) + (last_qty * last_px)) / cum_qty if cum_qty > 0 else price
-        else:
-            cum_qty = prev_cum_qty 
-            leaves_qty = max(0, order_qty - cum_qty)
-            avg_px = self.order_book.get(cl_ord_id, {}).get("avg_px", price)
+        if ord_status in [fix.OrdStatus_CANCELED, fix.OrdStatus_REJECTED]:
+            if ord_status == fix.OrdStatus_REJECTED and self.scheduler is not None:
+                self.scheduler.on_reject()
+            if console.orders:
+                print(f"Order Cancelled/Rejected: ClOrdID={target}, Symbol={symbol}, Side={side}")
 
         if ord_status not in [fix.OrdStatus_PARTIALLY_FILLED, fix.OrdStatus_FILLED]:
-            print(f"skipping execution report with status {ord_status}")
+            if console.debug:
+                print(f"skipping execution report with status {ord_status}")
             return
 
         exec_report = execution_report(exec_type, cl_ord_id, order_id,
@@ -179,66 +326,16 @@ class Application(fix.Application):
         logger.info(exec_report)
 
         if ord_status in [fix.OrdStatus_NEW, fix.OrdStatus_PENDING_NEW]:
-            print(f"New Order Acknowledged: ClOrdID={cl_ord_id}, Symbol={symbol}, Side={side}, OrderQty={order_qty}, Price={price}")
+            if console.orders:
+                print(f"New Order Acknowledged: ClOrdID={cl_ord_id}, Symbol={symbol}, Side={side}, OrderQty={order_qty}, Price={price}")
             return  # Don't process stats for `39=0` but display in logs
-        
-        if ord_status in [fix.OrdStatus_CANCELED, fix.OrdStatus_REJECTED]:
-            if cl_ord_id in self.open_orders:
-                del self.open_orders[cl_ord_id]
-            if cl_ord_id in self.order_book:
-                del self.order_book[cl_ord_id]
-            print(f"Order Cancelled/Rejected: ClOrdID={cl_ord_id}, Symbol={symbol}, Side={side}")
-            return
 
-        if exec_type == fix.ExecType_PARTIAL_FILL:
-            self.order_book[cl_ord_id] = {"symbol": symbol,
-                "side": side,
-                "order_qty": order_qty,
-                "price": price,
-                "cum_qty": cum_qty,
-                "leaves_qty": leaves_qty,
-                "avg_px": avg_px
-            }
-
-            self.total_volume += last_px * exec_qty
-
-            self.portfolio[cl_ord_id] = {"symbol": symbol, "side": side, "order_qty": order_qty, "price": price, "PnL": 0}
-
-            self.vwap_data[symbol]["priceXvol"] += last_px * exec_qty
-            self.vwap_data[symbol]["total_qty"] += exec_qty
-            self.vwap_data[symbol]["vwap"] = self.vwap_data[symbol]["priceXvol"] / self.vwap_data[symbol]["total_qty"] if self.vwap_data[symbol]["total_qty"] > 0 else 0.0
-
-        if exec_type == fix.ExecType_FILL:
-            self.order_book[cl_ord_id] = {"symbol": symbol,
-                "side": side,
-                "order_qty": order_qty,
-                "price": price,
-                "cum_qty": cum_qty,
-                "leaves_qty": leaves_qty,
-                "avg_px": avg_px
-            }
-
-            self.vwap_data[symbol]["priceXvol"] += last_px * exec_qty
-            self.vwap_data[symbol]["total_qty"] += exec_qty
-            self.vwap_data[symbol]["vwap"] = self.vwap_data[symbol]["priceXvol"] / self.vwap_data[symbol]["total_qty"] if self.vwap_data[symbol]["total_qty"] > 0 else 0.0
-
-            self.total_volume += last_px * exec_qty
-
-            if cl_ord_id in self.open_orders:
-                del self.open_orders[cl_ord_id]
-
-            self.portfolio[cl_ord_id] = {"symbol": symbol, "side": side, "order_qty": order_qty, "price": price}
-                
-        self.pnl = sum(self.portfolio[symbol].get("PnL", 0.0) for symbol in self.portfolio)
-        
-        print("\n============ MARKET STATS ============")
-        for symbol, data in self.vwap_data.items():
-            print(f"VWAP for {symbol}: {round(data['vwap'], 5)} USD")
-        print(f"Total Volume: {round(self.total_volume, 5)} USD")
-        print(f"PnL: {round(self.pnl, 5)} USD")
-        print("======================================\n")
+        if console.stats_due():
+            self.print_market_stats()
 
-        self.save_market_stats()
+        stats_start = time.perf_counter_ns()
+        self.save_market_stats([exec_report.Symbol])
+        self.latency.record(report.msg_type, "stats", time.perf_counter_ns() - stats_start)
 
         if exec_type == fix.ExecType_NEW:
             logger.info(f"New Order: ClOrdID={cl_ord_id}, OrderID={order_id}, Symbol={symbol}, Side={side}, OrderQty={order_qty}, Price={price}")
@@ -250,30 +347,34 @@ class Application(fix.Application):
             logger.error(f"Order Rejected: ClOrdID={cl_ord_id}, OrderID={order_id}, Symbol={symbol}, Side={side}, OrderQty={order_qty}, Price={price}")
         elif exec_type == fix.ExecType_CANCELED:
             logger.info(f"Order Cancelled: ClOrdID={cl_ord_id}, OrderID={order_id}, Symbol={symbol}, Side={side}, OrderQty={order_qty}, Price={price}")
+        elif exec_type == fix.ExecType_REPLACED:
+            logger.info(f"Order Replaced: ClOrdID={cl_ord_id}, OrigClOrdID={report.orig_cl_ord_id}, OrderID={order_id}, Symbol={symbol}, Side={side}, OrderQty={order_qty}, Price={price}, AvgPx={avg_px}, LeavesQty={leaves_qty}, CumQty={cum_qty}")
         else:
             logger.error(f"Unknown Execution Type: {exec_type}")
 
-    def save_market_stats(self):
-        with open("market_stats.txt", "w") as f:
-            f.write("\n============ MARKET STATS ============\n")
-            for symbol, data in self.vwap_data.items():
-                f.write(f"VWAP for {symbol}: {round(data['vwap'], 5)} USD\n")
-            f.write(f"Total Volume: {round(self.total_volume, 5)} USD\n")
-            f.write(f"PnL: {round(self.pnl, 5)} USD\n")
-            f.write("======================================\n")
+    def print_market_stats(self):
+        print("\n============ MARKET STATS ============")
+        for symbol, data in self.vwap_data.items():
+            print(f"VWAP for {symbol}: {round(data['vwap'], 5)} USD")
+        print(f"Total Volume: {round(self.total_volume, 5)} USD")
+        print(f"PnL: {round(self.pnl, 5)} USD")
+        print(f"Unrealised PnL: {round(self.accounting.unrealised_pnl, 5)} USD")
+        print("======================================\n")
 
-        print("Market stats saved to market_stats.txt")
+    def save_market_stats(self, symbols=None):
+        pnl_by_symbol = {symbol: self.portfolio[symbol].realised for symbol in (symbols or self.vwap_data) if symbol in self.portfolio}
+        self.stats.publish(self.vwap_data, self.total_volume, self.pnl, pnl_by_symbol, symbols)
 
     def new_order(self):
-        symbols = ["MSFT", "AAPL", "BAC"]
+        start = time.perf_counter_ns()
         ord_types = [fix.OrdType_LIMIT, fix.OrdType_MARKET]
 
         ord_type = random.choice(ord_types)
-        symbol = random.choice(symbols)
+        symbol = random.choice(SYMBOLS)
         order_qty = random.randint(1,100)
         price = random.uniform(100,200) if ord_type == fix.OrdType_LIMIT else None
 
-        if symbol in self.portfolio and self.portfolio[symbol]["position"] > 0:
+        if symbol in self.portfolio and self.portfolio[symbol].position > 0:
             sides = [fix.Side_SELL, fix.Side_BUY]
         else:
             sides = [fix.Side_BUY, fix.Side_SELL_SHORT]
@@ -281,154 +382,212 @@ class Application(fix.Application):
         side = random.choice(sides)
 
         if side == fix.Side_SELL and symbol in self.portfolio:
-            max_sell_qty = self.portfolio[symbol]["position"]
+            max_sell_qty = self.portfolio[symbol].position
             if max_sell_qty > 0:
                 order_qty = random.randint(1, max_sell_qty)
             else:
-                print(f"Cannot sell {symbol} as position is 0")
-
-        message = fix.Message()
-        header = message.getHeader()
-
-        header.setField(fix.MsgType(fix.MsgType_NewOrderSingle)) #39 = D 
+                if self.console.orders:
+                    print(f"Cannot sell {symbol} as position is 0")
 
         ClOrdID = self.genClOrdID()
-        message.setField(fix.ClOrdID(ClOrdID)) 
-        message.setField(fix.Side(side)) 
-        message.setField(fix.Symbol(symbol)) 
-        message.setField(fix.OrderQty(order_qty))
-        message.setField(fix.OrdType(ord_type))
-        if ord_type == fix.OrdType_LIMIT:
-            message.setField(fix.Price(price))
-        message.setField(fix.HandlInst("1"))
-        message.setField(fix.TimeInForce('0'))
-        message.setField(fix.Text("NewOrderSingle"))
-        trstime = fix.TransactTime()
-        trstime.setString(datetime.now().strftime("%Y%m%d-%H:%M:%S.%f")[:-3])
-        message.setField(trstime)
-
-        raw_msg = message.toString().replace(__SOH__, "|")
-        logger.info(f"DEBUG: Sending New Order -> {raw_msg}")
+        message = self.new_order_template.build(ClOrdID, side, symbol, order_qty, ord_type,
+                                                price, self.timestamps.now())
+
+        # Add details to open orders before the report can come back
+        order_args = (ClOrdID, symbol, side, order_qty, price if ord_type == fix.OrdType_LIMIT else None)
+        self.accounting.add_order(*order_args)
+        self.record_delta(fix.MsgType_NewOrderSingle, order_args)
+
+        self.send(message, fix.MsgType_NewOrderSingle, ClOrdID, start)
+        if self.first_order_pending:
+            self.record_first_order()
+
+        if self.console.orders:
+            print(f"Order {ClOrdID} sent")
+        return ClOrdID
+
+    def send(self, message, msg_type, cl_ord_id, start):
+        latency = self.latency
+        send_start = time.perf_counter_ns()
+        latency.record(msg_type, "build", send_start - start)
+        latency.outbound(cl_ord_id, start)
+        latency.sending = (msg_type, start)
+        try:
+            self.send_to_target(message)
+        finally:
+            latency.sending = None
+        latency.record(msg_type, "sendToTarget", time.perf_counter_ns() - send_start)
 
+    def send_to_target(self, message):
         fix.Session.sendToTarget(message, self.sessionID)
 
-        # Add details to open orders
-        self.order_book[ClOrdID] = {"symbol": symbol,
-                                    "side": side,
-                                    "order_qty": order_qty,
-                                    "price": price if ord_type == fix.OrdType_LIMIT else None,
-                                    "cum_qty": 0,
-                                    "leaves_qty": order_qty,
-                                    "avg_px": 0.0
-                                    }
-        
-        self.open_orders[ClOrdID] = self.order_book[ClOrdID].copy()
-        print(f"Order {ClOrdID} sent")
-
     def order_cancel(self, ClOrdID):
-        if ClOrdID not in self.open_orders:
-            print(f"Invalid ClOrdID: {ClOrdID}")
+        # returns the cancel request's ClOrdID, or None if nothing was sent
+        start = time.perf_counter_ns()
+        original_order = self.orders.get_open(ClOrdID)
+        if original_order is None:
+            if self.console.orders:
+                print(f"Invalid ClOrdID: {ClOrdID}")
+            return
+        if self.suppress_amendment(ClOrdID):
             return
 
-        original_order = self.open_orders[ClOrdID]
-        symbol = original_order["symbol"]
-        side = original_order["side"]
+        symbol = original_order.symbol
+        side = original_order.side
 
         if not symbol or not side:
-            print(f"Invalid order details for ClOrdID: {ClOrdID}")
+            if self.console.orders:
+                print(f"Invalid order details for ClOrdID: {ClOrdID}")
             return
 
-        message = fix.Message()
-        header = message.getHeader()
-
-        header.setField(fix.MsgType(fix.MsgType_OrderCancelRequest))
+        cancel_ClOrdID = self.genClOrdID()
+        message = self.cancel_template.build(cancel_ClOrdID, ClOrdID, symbol, side, self.timestamps.now())
 
-        message.setField(fix.ClOrdID(self.genClOrdID()))
-        message.setField(fix.OrigClOrdID(ClOrdID))
-        message.setField(fix.Symbol(symbol))
-        message.setField(fix.Side(side))
-        message.setField(fix.Text("OrderCancelRequest"))
-        trstime = fix.TransactTime()
-        trstime.setString(datetime.now().strftime("%Y%m%d-%H:%M:%S.%f")[:-3])
-        message.setField(trstime)
-        message.setField(fix.CxlRejResponseTo("1"))
+        self.amendments.begin(cancel_ClOrdID, ClOrdID, PENDING_CANCEL)
+        self.send(message, fix.MsgType_OrderCancelRequest, cancel_ClOrdID, start)
 
-        raw_msg = message.toString().replace(__SOH__, "|")
-        logger.info(f"DEBUG: Sending Order Cancel Request -> {raw_msg}")
+        if self.console.orders:
+            print(f"Order Cancel Request sent for ClOrdID: {ClOrdID}")
+        return cancel_ClOrdID
 
-        fix.Session.sendToTarget(message, self.sessionID)
-
-        print(f"Order Cancel Request sent for ClOrdID: {ClOrdID}")
-
-    def order_window(self):
-        start_time = time.time()
-        order_count = 0
+    def order_replace(self, ClOrdID, order_qty=None, price=None):
+        # amends quantity and/or price in one round trip, returns the new ClOrdID or None;
+        # worker thread only, other threads use submit_replace
+        start = time.perf_counter_ns()
+        order = self.orders.get_open(ClOrdID)
+        if order is None:
+            if self.console.orders:
+                print(f"Invalid ClOrdID: {ClOrdID}")
+            return
+        if self.suppress_amendment(ClOrdID):
+            return
 
-        while self.sessionID is None:
+        order_qty = order_qty or order.order_qty
+        price = order.price if price is None else price
+        ord_type = fix.OrdType_LIMIT if price is not None else fix.OrdType_MARKET
+        replace_ClOrdID = self.genClOrdID()
+        message = self.replace_template.build(replace_ClOrdID, ClOrdID, order.symbol, order.side, order_qty,
+                                              ord_type, price, self.timestamps.now())
+
+        self.amendments.begin(replace_ClOrdID, ClOrdID, PENDING_REPLACE, order_qty, price)
+        self.send(message, fix.MsgType_OrderCancelReplaceRequest, replace_ClOrdID, start)
+
+        if self.console.orders:
+            print(f"Order Cancel/Replace Request sent for ClOrdID: {ClOrdID}, OrderQty={order_qty}, Price={price}")
+        return replace_ClOrdID
+
+    def mass_cancel(self, symbol=None, side=None):
+        # FIX 4.2 has no OrderMassCancelRequest, so one cancel per matching open
+        # order goes out back to back without waiting for acks; worker thread
+        # only, other threads use submit_mass_cancel
+        targets = [order.cl_ord_id for order in self.orders.live.values()
+                   if (symbol is None or order.symbol == symbol) and (side is None or order.side == side)]
+        sent = 0
+        for ClOrdID in targets:
+            if self.order_cancel(ClOrdID) is not None:
+                sent += 1
+        logger.info(f"Mass cancel symbol={symbol} side={side}: {sent} of {len(targets)} open orders")
+        return sent
+
+    def suppress_amendment(self, ClOrdID):
+        request = self.amendments.pending(ClOrdID)
+        if request is None:
+            return False
+        self.amendments.suppressed += 1
+        if self.console.orders:
+            print(f"Amendment for ClOrdID: {ClOrdID} suppressed, {request.kind} {request.cl_ord_id}")
+        return True
+
+    def cancel_random_order(self):
+        cancel_ID = self.orders.sample()
+        if cancel_ID is None:
+            return False
+        return self.order_cancel(cancel_ID) is not None
+
+    def submit_order(self):
+        self.submit(self.new_order)
+
+    def submit_cancel(self):
+        if not self.orders:
+            return False
+        self.submit(self.cancel_random_order)
+        return True
+
+    def submit_replace(self, ClOrdID, order_qty=None, price=None):
+        self.submit(self.order_replace, ClOrdID, order_qty, price)
+
+    def submit_mass_cancel(self, symbol=None, side=None):
+        self.submit(self.mass_cancel, symbol, side)
+
+    def backlog(self):
+        # orders waiting for their first report plus sends not yet picked up by the worker
+        return self.orders.unacked_count() + len(self.commands)
+
+    def drain(self, timeout=5.0):
+        # wait for outstanding reports before the session is stopped
+        deadline = time.monotonic() + timeout
+        while self.backlog() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.backlog()
+
+    def order_window(self, max_orders=1000, duration=300, rate=10.0, burst=1, cancel_ratio=0.1, max_backlog=100):
+        if not self.logged_on.is_set():
             print("Waiting for session to be established")
-            time.sleep(1)
+            self.logged_on.wait()
 
+        # sends pause while the session is down and resume on the next logon
+        self.scheduler = OrderScheduler(self.submit_order, self.submit_cancel, rate, burst, cancel_ratio,
+                                        max_orders, duration, self.backlog, max_backlog, ready=self.logged_on)
         try:
-            while time.time() - start_time < 300:
-                if order_count == 1000:
-                    logger.info("Order count reached, stopping order window")
-                    break
-
-
-                self.new_order()
-                order_count += 1
-
-                if random.random() < 0.1 and self.open_orders:
-                    cancel_ID = random.choice(list(self.open_orders.keys()))
-                    self.order_cancel(cancel_ID)
-                    
-                time.sleep(0.1)
+            self.scheduler.run()
+            logger.info("Order window finished")
         except KeyboardInterrupt:
             logger.info("Order window interrupted")
-            return
         except Exception as e:
             logger.error("Error in order window: %s" % e)
-            return
+        logger.info(self.scheduler.report())
+        logger.info(f"Queues: {self.queue_metrics()}")
+        logger.info(f"Amendments: {self.amendments.suppressed} suppressed, {self.amendments.rejected} rejected, "
+                    f"{self.amendments.expired} expired, {len(self.amendments)} pending")
     
-def main(config_file):
+def main(config_file, verbosity="orders", stats_interval=1.0):
+    setup_logger('logger', 'log/message.log')
+    initiator = None
+    application = None
     try:
         settings = fix.SessionSettings(config_file)
-        application = Application(settings)
+        # templates, decoder and registry are warmed up here, before the initiator connects
+        application = Application(verbosity=verbosity, stats_interval=stats_interval)
         storeFactory = fix.FileStoreFactory(settings)
         logFactory = fix.FileLogFactory(settings)
         initiator = fix.SocketInitiator(application, storeFactory, settings, logFactory)
-        
+
+        # kill -USR2 <pid> switches callback profiling on and off
+        if hasattr(signal, "SIGUSR2"):
+            signal.signal(signal.SIGUSR2, lambda signum, frame: application.latency.toggle_profiling())
+        # kill -USR1 <pid> cycles the console output level
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: application.console.cycle())
+
         initiator.start()
         application.order_window()
-        initiator.stop()
+        application.drain()
 
     except (fix.ConfigError, fix.RuntimeError) as e:
         print(e)
-        initiator.stop()
         sys.exit()
-        while True:
-            pass
-    
+    finally:
+        if initiator is not None:
+            initiator.stop()
+        if application is not None:
+            application.stop()
+            logger.info(application.latency.report())
+
 if __name__=='__main__':
     parser = argparse.ArgumentParser(description='FIX Client')
     parser.add_argument('file_name', type=str, help='Name of configuration file')
+    parser.add_argument('--verbosity', choices=list(LEVELS), default='orders', help='Console output level')
+    parser.add_argument('--stats-interval', type=float, default=1.0, help='Seconds between market stats displays')
     args = parser.parse_args()
 
-    try:
-        settings = fix.SessionSettings(args.file_name)
-        application = Application()
-        storeFactory = fix.FileStoreFactory(settings)
-        logFactory = fix.FileLogFactory(settings)
-        initiator = fix.SocketInitiator(application, storeFactory, settings, logFactory)
-            
-        initiator.start()
-        application.order_window()
-        initiator.stop()
-
-    except (fix.ConfigError, fix.RuntimeError) as e:
-        print(e)
-        initiator.stop()
-        sys.exit()
-        while True:
-            pass
-
+    main(args.file_name, args.verbosity, args.stats_interval)
@@ -0,0 +1,248 @@
+import os
+import gc
+import sys
+import json
+import time
+import logging
+import itertools
+import argparse
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+import quickfix as fix
+from helper import extract_message_field_value
+from execution_report import execution_report
+
+# Offline microbenchmarks for the message hot paths. Messages are synthetic
+# FIX strings parsed with fix.Message(str, dd); nothing is sent, sends stop at
+# serialization. Results can be saved as JSON and compared to a baseline.
+#
+#   python benchmark.py --json bench.json
+#   python benchmark.py --baseline bench.json --threshold 0.15
+
+__SOH__ = chr(1)
+SRC = os.path.dirname(os.path.abspath(__file__))
+SPEC = os.path.join(SRC, "spec", "FIX42.xml")
+SENDER = "DTL"
+TARGET = "OPS_CANDIDATE_7_7595"
+CL_ORD_ID = "BENCH-1"
+SENDING_TIME = "20240102-14:30:00.123"
+
+def build_raw(msg_type, body, seq=1):
+    # header and trailer with a correct BodyLength and CheckSum
+    header = [(35, msg_type), (49, SENDER), (56, TARGET), (34, seq), (52, SENDING_TIME)]
+    payload = "".join(f"{tag}={value}{__SOH__}" for tag, value in header + body)
+    head = f"8=FIX.4.2{__SOH__}9={len(payload)}{__SOH__}"
+    checksum = sum((head + payload).encode()) % 256
+    return f"{head}{payload}10={checksum:03d}{__SOH__}"
+
+def execution_report_body(cl_ord_id, exec_type, ord_status, last_shares, cum_qty, leaves_qty, missing=()):
+    body = [(6, "150.25"), (11, cl_ord_id), (14, cum_qty), (17, f"E-{cl_ord_id}-{exec_type}"), (20, "0"),
+            (31, "150.25"), (32, last_shares), (37, "O-1"), (38, 100), (39, ord_status), (40, "2"),
+            (44, "150.5"), (54, "1"), (55, "MSFT"), (60, SENDING_TIME), (150, exec_type), (151, leaves_qty)]
+    return [(tag, value) for tag, value in body if tag not in missing]
+
+# name -> body for a ClOrdID; every op gets its own freshly added order
+MESSAGES = {
+    "partial_fill": lambda cl_ord_id: execution_report_body(cl_ord_id, fix.ExecType_PARTIAL_FILL,
+                                                            fix.OrdStatus_PARTIALLY_FILLED, 10, 10, 90),
+    "fill": lambda cl_ord_id: execution_report_body(cl_ord_id, fix.ExecType_FILL, fix.OrdStatus_FILLED, 100, 100, 0),
+    "cancel": lambda cl_ord_id: execution_report_body(cl_ord_id, fix.ExecType_CANCELED, fix.OrdStatus_CANCELED,
+                                                      0, 0, 0) + [(41, cl_ord_id)],
+    "missing_fields": lambda cl_ord_id: execution_report_body(cl_ord_id, fix.ExecType_PARTIAL_FILL,
+                                                              fix.OrdStatus_PARTIALLY_FILLED, 10, 10, 90,
+                                                              missing=(6, 14, 151)),
+}
+
+def measure(fn, number, repeat, setup=None):
+    times = []
+    gc_enabled = gc.isenabled()
+    for _ in range(repeat):
+        if setup:
+            setup(number)
+        gc.disable()
+        try:
+            start = time.perf_counter_ns()
+            for _ in range(number):
+                fn()
+            times.append((time.perf_counter_ns() - start) / number)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    # net change in live blocks (allocated minus freed, so it can be negative),
+    # counted without tracemalloc whose own bookkeeping would be included
+    if setup:
+        setup(number)
+    gc.disable()
+    try:
+        blocks = sys.getallocatedblocks()
+        for _ in range(number):
+            fn()
+        blocks = sys.getallocatedblocks() - blocks
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    # separate pass for bytes, tracemalloc slows everything down
+    if setup:
+        setup(number)
+    tracemalloc.start()
+    try:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for _ in range(number):
+            fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"ns_per_op": min(times),
+            "median_ns_per_op": statistics.median(times),
+            "net_blocks_per_op": blocks / number,
+            "retained_bytes_per_op": (retained - current) / number,
+            "peak_kb": (peak - current) / 1024}
+
+def benchmarks(app_module):
+    dd = fix.DataDictionary(SPEC)
+    session_id = fix.SessionID("FIX.4.2", TARGET, SENDER)
+
+    class BenchApplication(app_module.Application):
+        def send_to_target(self, message):
+            # no session, serialization is what sendToTarget costs us before the socket
+            message.toString()
+
+    app = BenchApplication(stats_name="market_stats", state_dir="state", spec_path=SPEC)
+    app.sessionID = session_id
+    # the worker is stopped so fromApp is timed alone; setups drain the inbox
+    app.worker.stop()
+
+    fill_raw = build_raw(fix.MsgType_ExecutionReport, MESSAGES["fill"](CL_ORD_ID))
+    fill = fix.Message(fill_raw, dd)
+    report = execution_report("2", CL_ORD_ID, "O-1", "MSFT", "1", 100, 150.5, 150.25, 0, 100, "2", "2", None)
+    ids = itertools.count(2)
+
+    def reports(name, parse):
+        # setup adds one open order per op and builds its report up front, the
+        # timed call takes the next one; the list keeps them alive so freeing
+        # them does not show up in the memory figures
+        prepared = []
+        ops = [iter(prepared)]
+        def setup(number):
+            prepared.clear()
+            for _ in range(number):
+                cl_ord_id = f"BENCH-{next(ids)}"
+                app.accounting.add_order(cl_ord_id, "MSFT", "1", 100, 150.5)
+                raw = build_raw(fix.MsgType_ExecutionReport, MESSAGES[name](cl_ord_id))
+                prepared.append(fix.Message(raw, dd) if parse else raw)
+            ops[0] = iter(prepared)
+        return (lambda: next(ops[0])), setup
+
+    def drain_inbox(number):
+        while len(app.inbox):
+            app.inbox.get()
+
+    cancel_ids = []
+    def add_orders(number):
+        cancel_ids.clear()
+        for _ in range(number):
+            cancel_ids.append(app.new_order())
+
+    next_raw, raws_setup = reports("fill", False)
+    cases = [
+        ("helper.extract_message_field_value", lambda: extract_message_field_value(fix.LastPx(), fill, 'float'), None),
+        ("Application.fromApp", lambda: app.fromApp(fill, session_id), drain_inbox),
+        ("Application.handle_app_message",
+         lambda: app.handle_app_message(next_raw(), time.perf_counter_ns(), time.time_ns()), raws_setup),
+    ]
+    for name in MESSAGES:
+        next_message, setup = reports(name, True)
+        cases.append((f"parse_ExecutionReport.{name}",
+                      lambda next_message=next_message: app.parse_ExecutionReport(next_message(), session_id), setup))
+    cases += [
+        ("Application.new_order", app.new_order, None),
+        ("Application.order_cancel", lambda: app.order_cancel(cancel_ids.pop()), add_orders),
+        ("Application.save_market_stats", lambda: app.save_market_stats(["MSFT"]), None),
+        ("execution_report.__str__", report.__str__, None),
+    ]
+    return app, cases
+
+def compare(results, baseline, threshold):
+    # returns (name, baseline ns/op, ns/op, change) for every case slower than the threshold
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous["ns_per_op"]:
+            continue
+        change = result["ns_per_op"] / previous["ns_per_op"] - 1
+        if change > threshold:
+            regressions.append((name, previous["ns_per_op"], result["ns_per_op"], change))
+    return regressions
+
+def run(number, repeat, pattern=None):
+    # the application writes logs, stats and state relative to the working directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="fix-bench-") as workdir:
+        os.chdir(workdir)
+        try:
+            return run_in(number, repeat, pattern)
+        finally:
+            os.chdir(cwd)
+
+def run_in(number, repeat, pattern):
+    # records are still created at INFO so the logging calls are timed, but
+    # nothing is written to the console or a file
+    logger = logging.getLogger('logger')
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.NullHandler())
+    import application as app_module
+
+    app, cases = benchmarks(app_module)
+    results = {}
+    try:
+        with open(os.devnull, "w") as devnull:
+            for name, fn, setup in cases:
+                if pattern and pattern not in name:
+                    continue
+                with contextlib.redirect_stdout(devnull):
+                    results[name] = measure(fn, number, repeat, setup)
+                print(format_result(name, results[name]), flush=True)
+    finally:
+        app.stop()
+    return results
+
+def format_result(name, result):
+    return (f"{name:<42} {result['ns_per_op']:>12.0f} {result['median_ns_per_op']:>12.0f} "
+            f"{result['net_blocks_per_op']:>10.2f} {result['retained_bytes_per_op']:>10.1f} {result['peak_kb']:>10.1f}")
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Offline microbenchmarks for the FIX message hot paths')
+    parser.add_argument('--number', type=int, default=2000, help='Calls per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per benchmark, the fastest is reported')
+    parser.add_argument('--filter', type=str, default=None, help='Only run benchmarks whose name contains this')
+    parser.add_argument('--json', type=str, default=None, help='Write the results to this JSON file')
+    parser.add_argument('--baseline', type=str, default=None, help='Compare against results saved with --json')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed slowdown against the baseline, 0.10 = 10%%')
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    print(f"{'benchmark':<42} {'ns/op':>12} {'median':>12} {'net blocks':>10} {'retained B':>10} {'peak KB':>10}")
+    results = run(args.number, args.repeat, args.filter)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump({"python": sys.version.split()[0], "number": args.number, "repeat": args.repeat,
+                       "results": results}, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.0f} -> {after:.0f} ns/op (+{change * 100:.1f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions above {args.threshold * 100:.0f}% against {args.baseline}")
@@ -0,0 +1,47 @@
+import time
+import logging
+from model.logger import set_console_level
+
+# Console output levels. Hot paths test the boolean flags before formatting
+# anything, so a disabled level costs one attribute lookup. The market stats
+# block is printed at most once per stats_interval. The level can be changed
+# at runtime (set_level, or cycle on SIGUSR1 in application.py), and the
+# logger's console handler follows it; the log file is not affected.
+
+HEADLESS = 0    # session events only, nothing per message
+SUMMARY = 1     # plus the rate limited market stats block
+ORDERS = 2      # plus one line per order, cancel and report
+DEBUG = 3       # plus every raw inbound ExecutionReport
+
+LEVELS = {"headless": HEADLESS, "summary": SUMMARY, "orders": ORDERS, "debug": DEBUG}
+LEVEL_NAMES = {level: name for name, level in LEVELS.items()}
+# per message records are logged at INFO to ERROR, keep them off the console below ORDERS
+LOG_LEVELS = {HEADLESS: logging.CRITICAL, SUMMARY: logging.CRITICAL, ORDERS: logging.INFO, DEBUG: logging.DEBUG}
+
+class Console():
+    def __init__(self, level=ORDERS, stats_interval=1.0):
+        self.stats_interval = stats_interval
+        self.next_stats = 0.0
+        self.set_level(level)
+
+    def set_level(self, level):
+        if isinstance(level, str):
+            level = LEVELS[level]
+        self.level = level
+        self.summary = level >= SUMMARY
+        self.orders = level >= ORDERS
+        self.debug = level >= DEBUG
+        set_console_level('logger', LOG_LEVELS[level])
+
+    def cycle(self):
+        self.set_level((self.level + 1) % (DEBUG + 1))
+        print(f"Console output: {LEVEL_NAMES[self.level]}")
+
+    def stats_due(self):
+        if not self.summary:
+            return False
+        now = time.monotonic()
+        if now < self.next_stats:
+            return False
+        self.next_stats = now + self.stats_interval
+        return True
@@ -0,0 +1,125 @@
+import datetime
+
+__SOH__ = chr(1)
+
+# Single pass decoder for inbound application messages. The raw FIX string is
+# walked once and every tag we use is converted into a slotted record, instead
+# of one quickfix field object and isSetField/getField round trip per tag.
+
+def to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return int(float(value))
+        except ValueError:
+            return None
+
+def to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+# UTCTimestamp second -> datetime; strptime only runs once per distinct second,
+# the milliseconds are added to the cached value
+SECONDS = {}
+SECONDS_SIZE = 1024
+
+def to_datetime(value):
+    prefix = value[:17]
+    second = SECONDS.get(prefix)
+    if second is None:
+        try:
+            second = datetime.datetime.strptime(prefix, '%Y%m%d-%H:%M:%S')
+        except ValueError:
+            return None
+        if len(SECONDS) >= SECONDS_SIZE:
+            SECONDS.clear()
+        SECONDS[prefix] = second
+    if len(value) <= 17:
+        return second
+    fraction = value[18:]
+    if value[17] != "." or not fraction.isdigit() or len(fraction) > 6:
+        return None
+    return second.replace(microsecond=int(fraction.ljust(6, "0")))
+
+def to_epoch_ns(value):
+    # FIX timestamps are UTC
+    return int(value.replace(tzinfo=datetime.timezone.utc).timestamp() * 1e9)
+
+# tag -> (record attribute, converter)
+EXECUTION_REPORT_FIELDS = {
+    "6": ("avg_px", to_float),
+    "11": ("cl_ord_id", str),
+    "14": ("cum_qty", to_int),
+    "17": ("exec_id", str),
+    "31": ("last_px", to_float),
+    "32": ("last_shares", to_int),
+    "35": ("msg_type", str),
+    "37": ("order_id", str),
+    "38": ("order_qty", to_int),
+    "39": ("ord_status", str),
+    "40": ("ord_type", str),
+    "41": ("orig_cl_ord_id", str),
+    "44": ("price", to_float),
+    "52": ("sending_time", to_datetime),
+    "54": ("side", str),
+    "55": ("symbol", str),
+    "58": ("text", str),
+    "60": ("transact_time", to_datetime),
+    "102": ("cxl_rej_reason", str),
+    "110": ("min_qty", to_int),
+    "150": ("exec_type", str),
+    "151": ("leaves_qty", to_int),
+    "434": ("cxl_rej_response_to", str),
+    # session Reject
+    "45": ("ref_seq_num", to_int),
+    "372": ("ref_msg_type", str),
+    "373": ("session_reject_reason", str),
+}
+
+RECORD_FIELDS = tuple(name for name, _ in EXECUTION_REPORT_FIELDS.values())
+# positional layout of state journals written before records were stored by name, do not change
+TUPLE_RECORD_FIELDS = ("avg_px", "cl_ord_id", "cum_qty", "exec_id", "last_px", "last_shares", "msg_type", "order_id",
+                       "order_qty", "ord_status", "ord_type", "orig_cl_ord_id", "price", "sending_time", "side",
+                       "symbol", "text", "transact_time", "cxl_rej_reason", "min_qty", "exec_type", "leaves_qty",
+                       "cxl_rej_response_to", "ref_seq_num", "ref_msg_type", "session_reject_reason")
+
+class ExecutionReportRecord():
+    __slots__ = RECORD_FIELDS + ("raw", "missing")
+
+    def __init__(self, raw):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        self.raw = raw
+        self.missing = []
+
+def decode_execution_report(raw, sep=__SOH__):
+    record = ExecutionReportRecord(raw)
+    fields = EXECUTION_REPORT_FIELDS
+    for field in raw.split(sep):
+        tag, _, value = field.partition("=")
+        spec = fields.get(tag)
+        if spec is not None:
+            setattr(record, spec[0], spec[1](value))
+    return record
+
+def record_values(record):
+    # decoded fields by name for the state journal, so adding or reordering fields
+    # cannot shift values on recovery; unset fields are left out
+    values = {}
+    for name in RECORD_FIELDS:
+        value = getattr(record, name)
+        if value is not None:
+            values[name] = value
+    return values
+
+def record_from_values(values):
+    record = ExecutionReportRecord(None)
+    if isinstance(values, tuple):
+        values = dict(zip(TUPLE_RECORD_FIELDS, values))
+    for name, value in values.items():
+        if name in RECORD_FIELDS:
+            setattr(record, name, value)
+    return record
@@ -0,0 +1,135 @@
+import time
+import numpy as np
+
+# Append-only columnar fill history. Each column is a growable NumPy array so
+# analytics run vectorized over millions of fills; symbols are interned to
+# small integer indices.
+
+class FillStore():
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self.ts = np.empty(capacity, dtype=np.int64)       # epoch nanoseconds
+        self.symbol = np.empty(capacity, dtype=np.int32)   # index into self.symbols
+        self.side = np.empty(capacity, dtype=np.int8)      # FIX Side as a number, 1=buy 2=sell 5=sell short
+        self.qty = np.empty(capacity, dtype=np.float64)
+        self.px = np.empty(capacity, dtype=np.float64)
+        self.symbols = []
+        self.symbol_index = {}
+
+    def __len__(self):
+        return self.size
+
+    def intern(self, symbol):
+        index = self.symbol_index.get(symbol)
+        if index is None:
+            index = self.symbol_index[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return index
+
+    def grow(self):
+        capacity = len(self.ts) * 2
+        for name in ("ts", "symbol", "side", "qty", "px"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            setattr(self, name, grown)
+
+    def append(self, symbol, side, qty, px, ts=None):
+        if self.size == len(self.ts):
+            self.grow()
+        i = self.size
+        self.ts[i] = time.time_ns() if ts is None else ts
+        self.symbol[i] = self.intern(symbol)
+        self.side[i] = int(side) if side else 0
+        self.qty[i] = qty
+        self.px[i] = px
+        self.size = i + 1
+
+    def state(self):
+        n = self.size
+        return {"symbols": list(self.symbols),
+                **{name: getattr(self, name)[:n].copy() for name in ("ts", "symbol", "side", "qty", "px")}}
+
+    def restore(self, state):
+        self.symbols = list(state["symbols"])
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.size = len(state["ts"])
+        capacity = max(len(self.ts), self.size)
+        for name in ("ts", "symbol", "side", "qty", "px"):
+            column = np.empty(capacity, dtype=getattr(self, name).dtype)
+            column[:self.size] = state[name]
+            setattr(self, name, column)
+
+    def select(self, symbol=None, start=None, end=None):
+        # boolean mask over the filled part of the columns, or None for everything
+        n = self.size
+        mask = None
+        if symbol is not None:
+            index = self.symbol_index.get(symbol, -1)
+            mask = self.symbol[:n] == index
+        if start is not None:
+            mask = (self.ts[:n] >= start) if mask is None else mask & (self.ts[:n] >= start)
+        if end is not None:
+            mask = (self.ts[:n] < end) if mask is None else mask & (self.ts[:n] < end)
+        return mask
+
+    def column(self, name, mask=None):
+        values = getattr(self, name)[:self.size]
+        return values if mask is None else values[mask]
+
+    def vwap(self, symbol=None, start=None, end=None):
+        mask = self.select(symbol, start, end)
+        qty = self.column("qty", mask)
+        total = qty.sum()
+        return float(np.dot(self.column("px", mask), qty) / total) if total > 0 else 0.0
+
+    def rolling_vwap(self, window, symbol=None, now=None):
+        # window in seconds, ending now
+        now = time.time_ns() if now is None else now
+        return self.vwap(symbol, now - int(window * 1e9), now + 1)
+
+    def vwap_by_symbol(self):
+        n = self.size
+        count = len(self.symbols)
+        qty = np.bincount(self.symbol[:n], weights=self.qty[:n], minlength=count)
+        notional = np.bincount(self.symbol[:n], weights=self.px[:n] * self.qty[:n], minlength=count)
+        vwap = np.divide(notional, qty, out=np.zeros(count), where=qty > 0)
+        return dict(zip(self.symbols, vwap.tolist()))
+
+    def volume_by_side(self, symbol=None, start=None, end=None):
+        mask = self.select(symbol, start, end)
+        volume = np.bincount(self.column("side", mask), weights=self.column("qty", mask), minlength=6)
+        return {str(side): float(volume[side]) for side in np.nonzero(volume)[0]}
+
+    def participation_rate(self, market_volume, symbol=None, start=None, end=None):
+        # our traded quantity as a fraction of the market's over the same period
+        if market_volume <= 0:
+            return 0.0
+        return float(self.column("qty", self.select(symbol, start, end)).sum() / market_volume)
+
+    def bars(self, interval, symbol, start=None, end=None):
+        # OHLCV per interval (seconds) as a dict of arrays keyed by column
+        mask = self.select(symbol, start, end)
+        ts = self.column("ts", mask)
+        if len(ts) == 0:
+            empty = np.empty(0)
+            return {"start": np.empty(0, dtype=np.int64), "open": empty, "high": empty,
+                    "low": empty, "close": empty, "volume": empty, "vwap": empty}
+        order = np.argsort(ts, kind="stable")
+        ts = ts[order]
+        px = self.column("px", mask)[order]
+        qty = self.column("qty", mask)[order]
+
+        interval_ns = int(interval * 1e9)
+        bucket = ts // interval_ns
+        first = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        last = np.r_[first[1:], len(ts)] - 1
+        volume = np.add.reduceat(qty, first)
+        notional = np.add.reduceat(px * qty, first)
+        return {"start": bucket[first] * interval_ns,
+                "open": px[first],
+                "high": np.maximum.reduceat(px, first),
+                "low": np.minimum.reduceat(px, first),
+                "close": px[last],
+                "volume": volume,
+                "vwap": np.divide(notional, volume, out=np.zeros(len(first)), where=volume > 0)}
@@ -0,0 +1,155 @@
+import logging
+import cProfile
+import threading
+from array import array
+from collections import OrderedDict
+from decoder import to_epoch_ns
+
+logger = logging.getLogger('logger')
+
+# Hop by hop latency, recorded into fixed memory log-linear histograms
+# (HDR style: 7 significant bits, within 1/64 of the value) keyed by MsgType and hop.
+
+SUB_BITS = 7
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+MAX_SHIFT = 40                       # values up to ~2^47 ns (~39 h)
+BUCKETS = SUB_COUNT + MAX_SHIFT * HALF_COUNT
+
+def bucket_index(value):
+    if value < SUB_COUNT:
+        return value
+    shift = min(value.bit_length() - SUB_BITS, MAX_SHIFT)
+    return SUB_COUNT + (shift - 1) * HALF_COUNT + min((value >> shift) - HALF_COUNT, HALF_COUNT - 1)
+
+def bucket_value(index):
+    # upper bound of the values that land in a bucket
+    if index < SUB_COUNT:
+        return index
+    shift = (index - SUB_COUNT) // HALF_COUNT + 1
+    mantissa = (index - SUB_COUNT) % HALF_COUNT + HALF_COUNT
+    return ((mantissa + 1) << shift) - 1
+
+class Histogram():
+    def __init__(self):
+        self.counts = array("q", bytes(8 * BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        self.counts[bucket_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, n in enumerate(other.counts):
+            if n:
+                self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct):
+        if self.count == 0:
+            return 0
+        target = max(1, int(pct / 100.0 * self.count + 0.5))
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(bucket_value(i), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+class LatencyTracker():
+    def __init__(self, dump_interval=60.0, max_pending=100000):
+        self.histograms = {}
+        self.pending = OrderedDict()     # ClOrdID -> send start (perf_counter_ns)
+        self.max_pending = max_pending
+        self.sending = None              # send start of the order being sent on this thread
+        self.profiler = None
+        self.profile_lock = threading.Lock()
+
+        self.dump_interval = dump_interval
+        self.stopped = threading.Event()
+        if dump_interval:
+            self.dumper = threading.Thread(target=self.run, name="latency-dump", daemon=True)
+            self.dumper.start()
+
+    def histogram(self, msg_type, hop):
+        key = f"{msg_type}.{hop}"
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    def record(self, msg_type, hop, value):
+        self.histogram(msg_type, hop).record(value)
+
+    def outbound(self, cl_ord_id, start):
+        self.pending[cl_ord_id] = start
+        if len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+
+    def inbound(self, msg_type, cl_ord_id, received, received_wall, sending_time, transact_time):
+        start = self.pending.pop(cl_ord_id, None)
+        if start is not None:
+            self.record(msg_type, "round_trip", received - start)
+        # wall clock hops include any clock skew with the counterparty
+        if sending_time is not None:
+            self.record(msg_type, "wire_sending", received_wall - to_epoch_ns(sending_time))
+        if transact_time is not None:
+            self.record(msg_type, "wire_transact", received_wall - to_epoch_ns(transact_time))
+
+    def report(self):
+        lines = ["Latency (us):              count      p50      p99     p999      max"]
+        for key in sorted(self.histograms):
+            h = self.histograms[key]
+            lines.append(f"{key:<24} {h.count:>8} {h.percentile(50) / 1e3:>8.1f} {h.percentile(99) / 1e3:>8.1f} "
+                         f"{h.percentile(99.9) / 1e3:>8.1f} {h.max / 1e3:>8.1f}")
+        return "\n".join(lines)
+
+    def run(self):
+        while not self.stopped.wait(self.dump_interval):
+            if self.histograms:
+                logger.info(self.report())
+
+    def stop(self):
+        self.stopped.set()
+
+    def enable_profiling(self):
+        with self.profile_lock:
+            if self.profiler is None:
+                self.profiler = cProfile.Profile()
+
+    def disable_profiling(self, path="log/callbacks.prof"):
+        with self.profile_lock:
+            profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.dump_stats(path)
+            logger.info(f"Callback profile written to {path}")
+        return profiler
+
+    def toggle_profiling(self):
+        if self.profiler is None:
+            self.enable_profiling()
+        else:
+            self.disable_profiling()
+
+    def profile(self, fn, *args):
+        profiler = self.profiler
+        if profiler is None:
+            return fn(*args)
+        return profiler.runcall(fn, *args)
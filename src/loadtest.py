@@ -0,0 +1,105 @@
+import sys
+import time
+import argparse
+import quickfix as fix
+from application import Application
+from console import HEADLESS, ORDERS
+from model.logger import setup_logger
+
+# Load driver for the local simulator: sends orders through the normal
+# Application paths and measures send -> first ExecutionReport latency.
+
+class LoadApplication(Application):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent = 0
+        self.cancels = 0
+        self.cancel_acks = 0
+        self.received = 0
+
+    def new_order(self):
+        ClOrdID = super().new_order()
+        self.sent += 1
+        return ClOrdID
+
+    def order_cancel(self, ClOrdID):
+        cancel_ClOrdID = super().order_cancel(ClOrdID)
+        if cancel_ClOrdID is not None:
+            self.cancels += 1
+        return cancel_ClOrdID
+
+    def on_execution_report(self, report):
+        if report.exec_type == fix.ExecType_CANCELED:
+            self.cancel_acks += 1
+        super().on_execution_report(report)
+
+    def fromApp(self, message, sessionID):
+        self.received += 1
+        super().fromApp(message, sessionID)
+
+def report(application, elapsed, cpu):
+    # round trips are measured by the application's own LatencyTracker
+    latencies = application.latency.histogram(fix.MsgType_ExecutionReport, "round_trip")
+    messages = application.sent + application.cancels + application.received
+
+    print("\n============ LOAD TEST ============")
+    print(f"Orders sent: {application.sent} in {round(elapsed, 3)} s")
+    print(f"Orders/sec: {round(application.sent / elapsed, 2) if elapsed > 0 else 0.0}")
+    print(f"Target rate: {application.scheduler.target_rate} msg/s, achieved: {round(application.scheduler.achieved_rate(), 2)} msg/s")
+    print(f"Cancels sent: {application.cancels}, suppressed: {application.amendments.suppressed}, "
+          f"rejected: {application.amendments.rejected}")
+    # every cancel sent must be answered, an unanswered one usually means the session rejected it
+    answered = application.cancel_acks + application.amendments.rejected
+    print(f"Cancels acked: {application.cancel_acks} of {application.cancels}")
+    if answered < application.cancels:
+        print(f"WARNING: {application.cancels - answered} cancels were neither acked nor rejected")
+    print(f"Reports received: {application.received}")
+    print(f"Unanswered orders: {application.orders.unacked_count()}")
+    for pct in (50, 90, 99, 99.9):
+        print(f"Latency p{pct}: {round(latencies.percentile(pct) / 1e3, 1)} us")
+    print(f"Latency max: {round(latencies.max / 1e3, 1)} us")
+    print(f"Queues: {application.queue_metrics()}")
+    print(f"CPU per message: {round(cpu / messages * 1e6, 1) if messages else 0.0} us")
+    print("===================================\n")
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='FIX load driver')
+    parser.add_argument('file_name', type=str, help='Name of configuration file')
+    parser.add_argument('--orders', type=int, default=1000, help='Number of orders to send')
+    parser.add_argument('--duration', type=float, default=300, help='Maximum seconds to send for')
+    parser.add_argument('--rate', type=float, default=1000.0, help='Target messages per second')
+    parser.add_argument('--burst', type=int, default=1, help='Messages that may be sent back to back')
+    parser.add_argument('--cancel-ratio', type=float, default=0.1, help='Fraction of messages that are cancels')
+    parser.add_argument('--drain', type=float, default=5.0, help='Seconds to wait for outstanding reports')
+    parser.add_argument('--quiet', action='store_true', help='Suppress per-order console output')
+    args = parser.parse_args()
+
+    # kept apart from the live client, like store/loadtest and log/loadtest in loadtest.cfg,
+    # so simulator fills never reach its recovered state, journal or stats
+    setup_logger('logger', 'log/loadtest/message.log')
+    try:
+        settings = fix.SessionSettings(args.file_name)
+        application = LoadApplication(verbosity=HEADLESS if args.quiet else ORDERS, stats_name="market_stats.loadtest",
+                                      state_dir="state/loadtest", journal_path="log/loadtest/journal.log")
+        storeFactory = fix.FileStoreFactory(settings)
+        logFactory = fix.FileLogFactory(settings)
+        initiator = fix.SocketInitiator(application, storeFactory, settings, logFactory)
+
+        initiator.start()
+        application.wait_for_logon()
+
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        application.order_window(args.orders, args.duration, args.rate, args.burst, args.cancel_ratio)
+        elapsed = time.perf_counter() - start
+
+        application.drain(args.drain)
+        cpu = time.process_time() - cpu_start
+
+        initiator.stop()
+        application.stop()
+        report(application, elapsed, cpu)
+
+    except (fix.ConfigError, fix.RuntimeError) as e:
+        print(e)
+        sys.exit()
@@ -0,0 +1,120 @@
+import os
+import sys
+import gzip
+import shutil
+import time
+import atexit
+import argparse
+import datetime
+import threading
+from collections import deque
+
+__SOH__ = chr(1)
+
+# Raw message journal. Callbacks only append (timestamp, direction, raw) to a
+# deque; a background thread writes batches, rotates by size and optionally
+# gzips rotated files. SOH -> "|" formatting is left to read_journal.
+
+DIRECTIONS = {"AS": "(Server) S >>",
+              "AR": "(Server) R <<",
+              "S": "(Client) S >>",
+              "R": "(Client) R <<"}
+
+class Journal():
+    def __init__(self, path, max_bytes=64 * 1024 * 1024, backup_count=10, compress=False,
+                 batch_size=512, flush_interval=0.05):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "ab")
+        self.size = self.file.tell()
+
+        self.pending = deque()
+        self.wakeup = threading.Event()
+        self.running = True
+        self.writer = threading.Thread(target=self.run, name="journal-writer", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def record(self, direction, raw):
+        self.pending.append((time.time_ns(), direction, raw))
+        if len(self.pending) >= self.batch_size:
+            self.wakeup.set()
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.wakeup.set()
+        self.writer.join()
+        self.file.close()
+
+    def run(self):
+        while self.running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.write_pending()
+        self.write_pending()
+
+    def write_pending(self):
+        pending = self.pending
+        if not pending:
+            return
+        lines = []
+        while pending:
+            ts, direction, raw = pending.popleft()
+            lines.append(f"{ts} {direction} {raw}\n")
+        data = "".join(lines).encode()
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        suffix = ".gz" if self.compress else ""
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}{suffix}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}{suffix}")
+        if self.backup_count > 0:
+            if self.compress:
+                with open(self.path, "rb") as source, gzip.open(f"{self.path}.1.gz", "wb") as target:
+                    shutil.copyfileobj(source, target)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, "wb")
+        self.size = 0
+
+def open_journal(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+def read_journal(path, sep="|"):
+    with open_journal(path) as f:
+        for line in f:
+            ts, direction, raw = line.rstrip("\n").split(" ", 2)
+            when = datetime.datetime.fromtimestamp(int(ts) / 1e9)
+            yield f"{when.strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]} : {DIRECTIONS.get(direction, direction)} {raw.replace(__SOH__, sep)}"
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Print a message journal')
+    parser.add_argument('files', nargs='+', help='Journal files, oldest first')
+    args = parser.parse_args()
+
+    try:
+        for path in args.files:
+            for line in read_journal(path):
+                print(line)
+    except BrokenPipeError:
+        sys.exit()
@@ -1,13 +1,26 @@
 #!/usr/bin/python
 # -*- coding: utf8 -*-
+import os
 import logging
+
+CONSOLE_HANDLER = "console"
+
 def setup_logger(logger_name, log_file, level=logging.INFO):
     logger = logging.getLogger(logger_name)
     formatter = logging.Formatter('%(asctime)s : %(message)s')
-    fileHandler = logging.FileHandler(log_file, mode='w')
+    if os.path.dirname(log_file):
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    fileHandler = logging.FileHandler(log_file, mode='a')
     fileHandler.setFormatter(formatter)
     logger.setLevel(level)
     logger.addHandler(fileHandler)
     streamHandler = logging.StreamHandler()
     streamHandler.setFormatter(formatter)
-    logger.addHandler(streamHandler) 
\ No newline at end of file
+    streamHandler.set_name(CONSOLE_HANDLER)
+    logger.addHandler(streamHandler)
+
+def set_console_level(logger_name, level):
+    # only the StreamHandler, the log file keeps every record
+    for handler in logging.getLogger(logger_name).handlers:
+        if handler.get_name() == CONSOLE_HANDLER:
+            handler.setLevel(level) 
\ No newline at end of file
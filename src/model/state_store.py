@@ -0,0 +1,202 @@
+import os
+import re
+import zlib
+import time
+import pickle
+import struct
+import atexit
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger('logger')
+
+# Crash recovery for application state. Every change is appended to a delta
+# file as a length + crc framed pickle; a background thread writes batches and
+# fsyncs once per batch. Periodically the owner hands over a copy of its state,
+# which the same thread writes as a snapshot, after which a new delta file is
+# started. Recovery loads the newest readable snapshot and replays only the
+# delta files written after it.
+#
+# state/snapshot.<seq>   state after <seq> deltas
+# state/deltas.<seq>     deltas <seq>+1 onwards
+
+FRAME = struct.Struct("<II")         # payload length, crc32
+SNAPSHOT = object()
+FILE_NAME = re.compile(r"^(snapshot|deltas)\.(\d+)$")
+
+class StateStore():
+    def __init__(self, directory="state", snapshot_interval=30.0, snapshot_deltas=100000,
+                 fsync_interval=0.05, keep=2):
+        self.directory = directory
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_deltas = snapshot_deltas
+        self.fsync_interval = fsync_interval
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+        self.seq = 0                 # deltas recorded so far, including recovered ones
+        self.snapshot_seq = 0
+        self.last_snapshot = time.monotonic()
+        self.file = None
+        self.pending = deque()
+        self.wakeup = threading.Event()
+        self.running = False
+        self.writer = threading.Thread(target=self.run, name="state-writer", daemon=True)
+
+    def path(self, kind, seq):
+        return os.path.join(self.directory, f"{kind}.{seq:012d}")
+
+    def files(self, kind):
+        found = []
+        for name in os.listdir(self.directory):
+            match = FILE_NAME.match(name)
+            if match and match.group(1) == kind:
+                found.append((int(match.group(2)), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    def recover(self, restore, apply):
+        # restore(state) loads a snapshot, apply(kind, data) replays one delta
+        started = time.perf_counter()
+        for seq, path in reversed(self.files("snapshot")):
+            try:
+                with open(path, "rb") as f:
+                    state = pickle.load(f)
+            except Exception as e:
+                logger.warning(f"Skipping unreadable snapshot {path}: {e}")
+                continue
+            restore(state)
+            self.seq = self.snapshot_seq = seq
+            break
+
+        replayed = 0
+        deltas = self.files("deltas")
+        for i, (start, path) in enumerate(deltas):
+            if i + 1 < len(deltas) and deltas[i + 1][0] <= self.seq:
+                continue          # the next file starts at or before the state we already have
+            if start > self.seq:
+                logger.error(f"Delta files are missing between {self.seq} and {start}, stopping recovery")
+                break
+            seq = start
+            for kind, data in self.read_deltas(path):
+                seq += 1
+                if seq <= self.seq:
+                    continue
+                try:
+                    apply(kind, data)
+                except Exception as e:
+                    logger.error(f"Error replaying delta {seq} from {path}: {e}")
+                self.seq = seq
+                replayed += 1
+
+        logger.info(f"Recovered state at delta {self.seq} from snapshot {self.snapshot_seq} "
+                    f"and {replayed} deltas in {round(time.perf_counter() - started, 3)} s")
+        return replayed
+
+    def read_deltas(self, path):
+        # stops at the first torn or corrupt frame, the rest of the file was never acknowledged
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, offset)
+            payload = data[offset + FRAME.size:offset + FRAME.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning(f"Truncated delta file {path} at byte {offset}")
+                return
+            yield pickle.loads(payload)
+            offset += FRAME.size + length
+
+    def start(self):
+        # deltas recorded from now on go to a new file after the recovered ones
+        self.file = open(self.path("deltas", self.seq), "wb")
+        self.last_snapshot = time.monotonic()
+        self.running = True
+        self.writer.start()
+        atexit.register(self.close)
+
+    def record(self, kind, data):
+        # called from the thread that owns the state
+        self.seq += 1
+        self.pending.append((kind, data))
+
+    def due(self):
+        since = self.seq - self.snapshot_seq
+        return since > 0 and (since >= self.snapshot_deltas or
+                              time.monotonic() - self.last_snapshot >= self.snapshot_interval)
+
+    def snapshot(self, state):
+        # state must be a copy, it is pickled on the writer thread
+        self.snapshot_seq = self.seq
+        self.last_snapshot = time.monotonic()
+        self.pending.append((SNAPSHOT, (self.seq, state)))
+        self.wakeup.set()
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.wakeup.set()
+        self.writer.join()
+        self.file.close()
+
+    def run(self):
+        while self.running:
+            self.wakeup.wait(self.fsync_interval)
+            self.wakeup.clear()
+            self.write_pending()
+        self.write_pending()
+
+    def write_pending(self):
+        pending = self.pending
+        if not pending:
+            return
+        frames = []
+        while pending:
+            kind, data = pending.popleft()
+            if kind is SNAPSHOT:
+                self.write_frames(frames)
+                frames = []
+                self.write_snapshot(*data)
+                continue
+            payload = pickle.dumps((kind, data), pickle.HIGHEST_PROTOCOL)
+            frames.append(FRAME.pack(len(payload), zlib.crc32(payload)))
+            frames.append(payload)
+        self.write_frames(frames)
+
+    def write_frames(self, frames):
+        if frames:
+            self.file.write(b"".join(frames))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def write_snapshot(self, seq, state):
+        path = self.path("snapshot", seq)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(state, f, pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Could not write snapshot {path}: {e}")
+            return
+
+        self.file.close()
+        self.file = open(self.path("deltas", seq), "wb")
+        self.prune()
+
+    def prune(self):
+        # keep the newest snapshots and the delta files needed to replay from the oldest of them
+        snapshots = self.files("snapshot")
+        if len(snapshots) <= self.keep:
+            return
+        oldest = snapshots[-self.keep][0]
+        for _, path in snapshots[:-self.keep]:
+            os.remove(path)
+        deltas = self.files("deltas")
+        for i, (start, path) in enumerate(deltas):
+            following = deltas[i + 1][0] if i + 1 < len(deltas) else None
+            if following is not None and following <= oldest:
+                os.remove(path)
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import mmap
+import time
+import atexit
+import struct
+import argparse
+import threading
+
+# Fixed layout live stats region in a memory mapped file. The trading process
+# writes under a sequence lock (odd while writing); monitors read without locks
+# and retry if the sequence moved. A background thread writes coalesced text
+# and JSON snapshots with an atomic rename instead of rewriting a file per fill.
+
+MAGIC = b"FXST"
+VERSION = 1
+HEADER = struct.Struct("<4sIQIIddd")   # magic, version, seq, count, capacity, total volume, pnl, updated
+SLOT = struct.Struct("<16sdddd")      # symbol, vwap, qty, notional, pnl
+SEQ_OFFSET = 8
+READ_RETRIES = 1000                   # a reader waits about a second for a writer stuck mid-update
+READ_RETRY_SLEEP = 0.001
+
+class StatsSurface():
+    def __init__(self, path="market_stats.shm", capacity=256, snapshot_path="market_stats",
+                 snapshot_interval=1.0):
+        self.path = path
+        self.capacity = capacity
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.slots = {}
+        self.seq = 0
+
+        size = HEADER.size + capacity * SLOT.size
+        with open(path, "wb") as f:
+            f.truncate(size)
+        self.file = open(path, "r+b")
+        self.buffer = mmap.mmap(self.file.fileno(), size)
+        HEADER.pack_into(self.buffer, 0, MAGIC, VERSION, 0, 0, capacity, 0.0, 0.0, time.time())
+
+        self.running = True
+        self.wakeup = threading.Event()
+        self.snapshotter = threading.Thread(target=self.run, name="stats-snapshot", daemon=True)
+        self.snapshotter.start()
+        atexit.register(self.close)
+
+    def publish(self, vwap_data, total_volume, pnl, pnl_by_symbol=None, symbols=None):
+        # symbols limits the write to the ones that changed, default is all of them
+        pnl_by_symbol = pnl_by_symbol or {}
+        buffer = self.buffer
+        self.seq += 1
+        struct.pack_into("<Q", buffer, SEQ_OFFSET, self.seq)
+        try:
+            for symbol in (symbols if symbols is not None else vwap_data):
+                data = vwap_data[symbol]
+                index = self.slots.get(symbol)
+                if index is None:
+                    if len(self.slots) == self.capacity:
+                        continue
+                    index = self.slots[symbol] = len(self.slots)
+                SLOT.pack_into(buffer, HEADER.size + index * SLOT.size, symbol.encode()[:16],
+                               data["vwap"], data["total_qty"], data["priceXvol"], pnl_by_symbol.get(symbol, 0.0))
+            HEADER.pack_into(buffer, 0, MAGIC, VERSION, self.seq, len(self.slots), self.capacity,
+                             total_volume, pnl, time.time())
+        finally:
+            # an exception must not leave the sequence odd, readers would wait for ever
+            self.seq += 1
+            struct.pack_into("<Q", buffer, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        if not self.running:
+            return
+        self.running = False
+        self.wakeup.set()
+        self.snapshotter.join()
+        try:
+            self.write_snapshot(read_stats_buffer(self.buffer))
+        except TimeoutError:
+            pass
+        self.buffer.close()
+        self.file.close()
+
+    def run(self):
+        last_seq = 0
+        while self.running:
+            self.wakeup.wait(self.snapshot_interval)
+            if self.seq != last_seq:
+                try:
+                    stats = read_stats_buffer(self.buffer)
+                except TimeoutError:
+                    continue
+                last_seq = stats["seq"]
+                self.write_snapshot(stats)
+
+    def write_snapshot(self, stats):
+        if not self.snapshot_path:
+            return
+        replace_file(f"{self.snapshot_path}.txt", format_stats(stats))
+        replace_file(f"{self.snapshot_path}.json", json.dumps(stats, indent=2))
+
+def replace_file(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def read_stats_buffer(buffer, retries=READ_RETRIES):
+    # raises TimeoutError if the sequence stays odd, e.g. the writer died mid-update
+    for _ in range(retries):
+        seq = struct.unpack_from("<Q", buffer, SEQ_OFFSET)[0]
+        if not seq % 2:
+            data = bytes(buffer)
+            if struct.unpack_from("<Q", buffer, SEQ_OFFSET)[0] == seq:
+                break
+        time.sleep(READ_RETRY_SLEEP)
+    else:
+        raise TimeoutError("Market stats region is stuck mid-update, the writer may have died")
+
+    magic, version, seq, count, capacity, total_volume, pnl, updated = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a market stats region")
+    symbols = {}
+    for index in range(count):
+        symbol, vwap, qty, notional, symbol_pnl = SLOT.unpack_from(data, HEADER.size + index * SLOT.size)
+        symbols[symbol.rstrip(b"\0").decode()] = {"vwap": vwap, "qty": qty, "notional": notional, "pnl": symbol_pnl}
+    return {"seq": seq, "updated": updated, "total_volume": total_volume, "pnl": pnl, "symbols": symbols}
+
+def read_stats(path="market_stats.shm"):
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return read_stats_buffer(buffer)
+        finally:
+            buffer.close()
+
+def format_stats(stats):
+    lines = ["", "============ MARKET STATS ============"]
+    for symbol, data in stats["symbols"].items():
+        lines.append(f"VWAP for {symbol}: {round(data['vwap'], 5)} USD")
+    lines.append(f"Total Volume: {round(stats['total_volume'], 5)} USD")
+    lines.append(f"PnL: {round(stats['pnl'], 5)} USD")
+    lines.append("======================================")
+    return "\n".join(lines) + "\n"
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Watch the live market stats region')
+    parser.add_argument('path', nargs='?', default='market_stats.shm', help='Stats region file')
+    parser.add_argument('--interval', type=float, default=1.0, help='Seconds between refreshes')
+    args = parser.parse_args()
+
+    try:
+        while True:
+            print(format_stats(read_stats(args.path)))
+            time.sleep(args.interval)
+    except TimeoutError as e:
+        print(e)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        sys.exit()
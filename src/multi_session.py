@@ -0,0 +1,156 @@
+import os
+import sys
+import queue
+import argparse
+import threading
+import configparser
+import multiprocessing
+from console import HEADLESS
+from model.stats_surface import StatsSurface, format_stats, read_stats_buffer
+
+# Runs N initiator sessions, each with its own SenderCompID and its own
+# Application in a worker process. Workers stream cumulative per-symbol
+# totals to the parent, which merges them into one stats region.
+
+def generate_configs(template_file, count, sender_template="{sender}_{index}", directory="multi"):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(count):
+        config = configparser.ConfigParser(interpolation=None)
+        config.optionxform = str
+        config.read(template_file)
+        sender = config["SESSION"]["SenderCompID"].strip()
+        name = sender_template.format(sender=sender, index=index)
+
+        for section in (config["DEFAULT"], config["SESSION"]):
+            section["SenderCompID"] = name
+        config["DEFAULT"]["FileStorePath"] = f"./store/{name}/"
+        config["DEFAULT"]["FileLogPath"] = f"./log/{name}/"
+
+        path = os.path.join(directory, f"{name}.cfg")
+        with open(path, "w") as f:
+            config.write(f)
+        paths.append((name, path))
+    return paths
+
+def snapshot(application, name, done=False):
+    # list() over dict items is atomic under the GIL, the worker thread may be writing
+    vwap_data = list(application.vwap_data.items())
+    portfolio = list(application.portfolio.items())
+    return {"name": name,
+            "done": done,
+            "symbols": {symbol: (data["priceXvol"], data["total_qty"]) for symbol, data in vwap_data},
+            "pnl_by_symbol": {symbol: position.realised for symbol, position in portfolio},
+            "total_volume": application.total_volume,
+            "pnl": application.pnl}
+
+def run_session(name, config_file, stats_queue, order_args, report_interval):
+    import quickfix as fix
+    import application as app_module
+    from model.logger import setup_logger
+
+    setup_logger('logger', 'log/message.log')
+    settings = fix.SessionSettings(config_file)
+    # each worker writes its own journal, stats region and state; the parent
+    # prints the aggregated stats, so workers stay quiet
+    application = app_module.Application(stats_name=f"market_stats.{name}", state_dir=f"state/{name}",
+                                         verbosity=HEADLESS, journal_path=f"log/journal.{name}.log")
+    storeFactory = fix.FileStoreFactory(settings)
+    logFactory = fix.FileLogFactory(settings)
+    initiator = fix.SocketInitiator(application, storeFactory, settings, logFactory)
+
+    stopped = threading.Event()
+    def report():
+        while not stopped.wait(report_interval):
+            stats_queue.put(snapshot(application, name))
+    reporter = threading.Thread(target=report, name="stats-reporter", daemon=True)
+    reporter.start()
+
+    try:
+        initiator.start()
+        application.order_window(*order_args)
+    finally:
+        stopped.set()
+        reporter.join()
+        initiator.stop()
+        application.stop()
+        stats_queue.put(snapshot(application, name, done=True))
+
+class Aggregator():
+    # applies the difference between a worker's new and previous cumulative
+    # snapshot, so each update costs O(symbols in that worker)
+    def __init__(self, stats_name="market_stats"):
+        self.latest = {}
+        self.vwap_data = {}
+        self.pnl_by_symbol = {}
+        self.total_volume = 0.0
+        self.pnl = 0.0
+        self.stats = StatsSurface(f"{stats_name}.shm", snapshot_path=stats_name)
+
+    def update(self, snapshot):
+        previous = self.latest.get(snapshot["name"], EMPTY_SNAPSHOT)
+        self.latest[snapshot["name"]] = snapshot
+
+        changed = []
+        for symbol, (priceXvol, total_qty) in snapshot["symbols"].items():
+            old_priceXvol, old_total_qty = previous["symbols"].get(symbol, (0.0, 0))
+            if priceXvol == old_priceXvol and total_qty == old_total_qty:
+                continue
+            data = self.vwap_data.setdefault(symbol, {"priceXvol": 0.0, "total_qty": 0, "vwap": 0.0})
+            data["priceXvol"] += priceXvol - old_priceXvol
+            data["total_qty"] += total_qty - old_total_qty
+            data["vwap"] = data["priceXvol"] / data["total_qty"] if data["total_qty"] > 0 else 0.0
+            changed.append(symbol)
+        for symbol, symbol_pnl in snapshot["pnl_by_symbol"].items():
+            self.pnl_by_symbol[symbol] = self.pnl_by_symbol.get(symbol, 0.0) + symbol_pnl - previous["pnl_by_symbol"].get(symbol, 0.0)
+        self.total_volume += snapshot["total_volume"] - previous["total_volume"]
+        self.pnl += snapshot["pnl"] - previous["pnl"]
+
+        self.stats.publish(self.vwap_data, self.total_volume, self.pnl, self.pnl_by_symbol, changed)
+
+EMPTY_SNAPSHOT = {"symbols": {}, "pnl_by_symbol": {}, "total_volume": 0.0, "pnl": 0.0}
+
+def run(config_file, sessions, sender_template, order_args, report_interval):
+    stats_queue = multiprocessing.Queue()
+    workers = []
+    for name, path in generate_configs(config_file, sessions, sender_template):
+        worker = multiprocessing.Process(target=run_session, name=name,
+                                         args=(name, path, stats_queue, order_args, report_interval))
+        worker.start()
+        workers.append(worker)
+
+    aggregator = Aggregator()
+    finished = set()
+    while len(finished) < len(workers):
+        try:
+            snapshot = stats_queue.get(timeout=report_interval)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers):
+                break
+            continue
+        aggregator.update(snapshot)
+        if snapshot["done"]:
+            finished.add(snapshot["name"])
+
+    for worker in workers:
+        worker.join()
+    stats = read_stats_buffer(aggregator.stats.buffer)
+    aggregator.stats.close()
+    print(format_stats(stats))
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Multi-session FIX client')
+    parser.add_argument('file_name', type=str, help='Template configuration file')
+    parser.add_argument('--sessions', type=int, default=2, help='Number of sessions, one worker process each')
+    parser.add_argument('--sender-template', type=str, default='{sender}_{index}', help='SenderCompID template')
+    parser.add_argument('--orders', type=int, default=1000, help='Orders per session')
+    parser.add_argument('--duration', type=float, default=300, help='Maximum seconds to send for')
+    parser.add_argument('--rate', type=float, default=10.0, help='Target messages per second per session')
+    parser.add_argument('--report-interval', type=float, default=1.0, help='Seconds between worker stats updates')
+    args = parser.parse_args()
+
+    try:
+        run(args.file_name, args.sessions, args.sender_template,
+            (args.orders, args.duration, args.rate), args.report_interval)
+    except KeyboardInterrupt:
+        sys.exit()
@@ -0,0 +1,171 @@
+import random
+from collections import OrderedDict
+
+# Order lifecycle states
+NEW = "NEW"
+PARTIAL = "PARTIAL"
+FILLED = "FILLED"
+CANCELED = "CANCELED"
+REJECTED = "REJECTED"
+
+TERMINAL_STATES = frozenset([FILLED, CANCELED, REJECTED])
+TRANSITIONS = {NEW: frozenset([PARTIAL, FILLED, CANCELED, REJECTED]),
+               PARTIAL: frozenset([PARTIAL, FILLED, CANCELED]),
+               FILLED: frozenset(),
+               CANCELED: frozenset(),
+               REJECTED: frozenset()}
+
+# fields kept in snapshots, index is rebuilt on restore
+STATE_FIELDS = ("cl_ord_id", "symbol", "side", "order_qty", "price",
+                "cum_qty", "leaves_qty", "avg_px", "state", "acked")
+
+class OrderRecord():
+    __slots__ = STATE_FIELDS + ("index",)
+
+    def __init__(self, cl_ord_id, symbol, side, order_qty, price):
+        self.cl_ord_id = cl_ord_id
+        self.symbol = symbol
+        self.side = side
+        self.order_qty = order_qty
+        self.price = price
+        self.cum_qty = 0
+        self.leaves_qty = order_qty
+        self.avg_px = 0.0
+        self.state = NEW
+        self.index = -1
+        self.acked = False
+
+    def __repr__(self):
+        return (f"OrderRecord({self.cl_ord_id} {self.state} {self.symbol} {self.side} "
+                f"{self.cum_qty}/{self.order_qty} @ {self.avg_px})")
+
+class OrderStore():
+    # Live orders are kept in a dict plus a dense id list so insert, lookup,
+    # random sampling and removal are all O(1). Terminal orders move to a
+    # bounded history so memory stays flat over long sessions.
+    def __init__(self, history_size=10000):
+        self.live = {}
+        self.live_ids = []
+        self.history = OrderedDict()
+        self.history_size = history_size
+        self.unacked = 0
+
+    def __len__(self):
+        return len(self.live)
+
+    def __contains__(self, cl_ord_id):
+        return cl_ord_id in self.live
+
+    def add(self, cl_ord_id, symbol, side, order_qty, price):
+        order = OrderRecord(cl_ord_id, symbol, side, order_qty, price)
+        order.index = len(self.live_ids)
+        self.live[cl_ord_id] = order
+        self.live_ids.append(cl_ord_id)
+        self.unacked += 1
+        return order
+
+    def get(self, cl_ord_id):
+        order = self.live.get(cl_ord_id)
+        if order is None:
+            order = self.history.get(cl_ord_id)
+        return order
+
+    def get_open(self, cl_ord_id):
+        return self.live.get(cl_ord_id)
+
+    def ack(self, cl_ord_id):
+        # first report seen for an order, unacked is the number still in flight
+        order = self.live.get(cl_ord_id)
+        if order is not None and not order.acked:
+            order.acked = True
+            self.unacked -= 1
+
+    def unacked_count(self):
+        return self.unacked
+
+    def expire_unacked(self):
+        # orders from an earlier session that will never be answered stop counting
+        # as in flight; they stay live. Returns how many were expired
+        expired = self.unacked
+        if expired:
+            for order in self.live.values():
+                order.acked = True
+            self.unacked = 0
+        return expired
+
+    def sample(self, rng=random):
+        if not self.live_ids:
+            return None
+        return self.live_ids[rng.randrange(len(self.live_ids))]
+
+    def update(self, cl_ord_id, state, cum_qty=None, leaves_qty=None, avg_px=None):
+        # returns None if the order is unknown or the transition is not allowed
+        order = self.live.get(cl_ord_id)
+        if order is None or state not in TRANSITIONS[order.state]:
+            return None
+        order.state = state
+        if cum_qty is not None:
+            order.cum_qty = cum_qty
+        if leaves_qty is not None:
+            order.leaves_qty = leaves_qty
+        if avg_px is not None:
+            order.avg_px = avg_px
+        if state in TERMINAL_STATES:
+            self.retire(order)
+        return order
+
+    def replace(self, orig_cl_ord_id, cl_ord_id, order_qty=None, price=None):
+        # an acknowledged cancel/replace, the order lives on under its new ClOrdID
+        order = self.live.pop(orig_cl_ord_id, None)
+        if order is None:
+            return None
+        order.cl_ord_id = cl_ord_id
+        if order_qty:
+            order.order_qty = order_qty
+            order.leaves_qty = max(0, order_qty - order.cum_qty)
+        if price is not None:
+            order.price = price
+        self.live[cl_ord_id] = order
+        self.live_ids[order.index] = cl_ord_id
+        return order
+
+    def retire(self, order):
+        if not order.acked:
+            order.acked = True
+            self.unacked -= 1
+        # swap the last live id into the freed slot
+        last_id = self.live_ids.pop()
+        if last_id != order.cl_ord_id:
+            self.live_ids[order.index] = last_id
+            self.live[last_id].index = order.index
+        del self.live[order.cl_ord_id]
+        order.index = -1
+
+        self.history[order.cl_ord_id] = order
+        if len(self.history) > self.history_size:
+            self.history.popitem(last=False)
+
+    def state(self):
+        # live orders in live_ids order, then the history oldest first
+        return {"live": [tuple(getattr(self.live[cl_ord_id], name) for name in STATE_FIELDS) for cl_ord_id in self.live_ids],
+                "history": [tuple(getattr(order, name) for name in STATE_FIELDS) for order in self.history.values()]}
+
+    def restore(self, state):
+        self.live.clear()
+        self.live_ids.clear()
+        self.history.clear()
+        self.unacked = 0
+        for values in state["live"]:
+            order = OrderRecord(*values[:5])
+            for name, value in zip(STATE_FIELDS, values):
+                setattr(order, name, value)
+            order.index = len(self.live_ids)
+            self.live[order.cl_ord_id] = order
+            self.live_ids.append(order.cl_ord_id)
+            if not order.acked:
+                self.unacked += 1
+        for values in state["history"]:
+            order = OrderRecord(*values[:5])
+            for name, value in zip(STATE_FIELDS, values):
+                setattr(order, name, value)
+            self.history[order.cl_ord_id] = order
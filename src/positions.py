@@ -0,0 +1,90 @@
+import quickfix as fix
+
+# Per symbol position keeping with average cost accounting. Every fill and
+# every mark updates one Position and the portfolio running totals by the
+# difference, so the cost per fill does not depend on how many orders or
+# symbols the session has seen.
+
+BUY_SIDES = (fix.Side_BUY, fix.Side_BUY_MINUS)
+
+class Position():
+    __slots__ = ("symbol", "position", "avg_price", "realised", "unrealised", "mark")
+
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.position = 0          # signed, short positions are negative
+        self.avg_price = 0.0       # average cost of the open position
+        self.realised = 0.0
+        self.unrealised = 0.0
+        self.mark = None
+
+class PositionEngine():
+    def __init__(self):
+        self.positions = {}
+        self.realised = 0.0
+        self.unrealised = 0.0
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, symbol):
+        return symbol in self.positions
+
+    def __getitem__(self, symbol):
+        return self.positions[symbol]
+
+    def get(self, symbol):
+        position = self.positions.get(symbol)
+        if position is None:
+            position = self.positions[symbol] = Position(symbol)
+        return position
+
+    def fill(self, symbol, side, qty, px):
+        # returns the PnL realised by this fill
+        if not qty:
+            return 0.0
+        p = self.get(symbol)
+        signed = qty if side in BUY_SIDES else -qty
+        position = p.position
+        realised = 0.0
+
+        if position == 0 or (position > 0) == (signed > 0):
+            p.avg_price = (p.avg_price * abs(position) + px * qty) / abs(position + signed)
+        else:
+            closed = min(qty, abs(position))
+            realised = (px - p.avg_price) * (closed if position > 0 else -closed)
+            if qty > abs(position):
+                p.avg_price = px       # flipped, the remainder was opened at this fill
+            elif qty == abs(position):
+                p.avg_price = 0.0
+
+        p.position = position + signed
+        p.realised += realised
+        self.realised += realised
+        self.mark(symbol, px)
+        return realised
+
+    def mark(self, symbol, px):
+        p = self.get(symbol)
+        p.mark = px
+        unrealised = (px - p.avg_price) * p.position if p.position else 0.0
+        self.unrealised += unrealised - p.unrealised
+        p.unrealised = unrealised
+
+    def state(self):
+        return [tuple(getattr(p, name) for name in Position.__slots__) for p in self.positions.values()]
+
+    def restore(self, state):
+        self.positions.clear()
+        for values in state:
+            p = self.positions[values[0]] = Position(values[0])
+            for name, value in zip(Position.__slots__, values):
+                setattr(p, name, value)
+        self.realised = sum(p.realised for p in self.positions.values())
+        self.unrealised = sum(p.unrealised for p in self.positions.values())
+
+    def mark_all(self, prices):
+        # batch mark to market, prices is {symbol: price}; costs O(len(prices))
+        for symbol, px in prices.items():
+            if px is not None:
+                self.mark(symbol, px)
@@ -0,0 +1,129 @@
+import os
+import pickle
+import logging
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger('logger')
+
+# Message schema derived from the quickfix data dictionary, and the MsgType ->
+# handler table built from it. The XML is parsed once and the compiled form is
+# pickled next to it, so later starts only parse the XML when it has changed.
+
+__SOH__ = chr(1)
+CACHE_VERSION = 1
+
+class MessageSchema():
+    __slots__ = ("msg_type", "name", "category", "required", "optional")
+
+    def __init__(self, msg_type, name, category, required, optional):
+        self.msg_type = msg_type
+        self.name = name
+        self.category = category
+        self.required = required          # frozenset of body tags
+        self.optional = optional
+
+class Schema():
+    def __init__(self, messages, field_names, field_values):
+        self.messages = messages          # MsgType -> MessageSchema
+        self.field_names = field_names    # tag -> name
+        self.field_tags = {name: tag for tag, name in field_names.items()}
+        self.field_values = field_values  # tag -> {enum: description}
+
+    def field_name(self, tag):
+        return self.field_names.get(int(tag), "Unknown")
+
+    def value_name(self, tag, value):
+        return self.field_values.get(int(tag), {}).get(value, value)
+
+def collect_fields(node, field_tags, components, required, optional, parent_required=True):
+    # fields inside an optional group or component are never required at message level
+    for child in node:
+        name = child.get("name")
+        is_required = parent_required and child.get("required") == "Y"
+        if child.tag == "field":
+            (required if is_required else optional).add(field_tags[name])
+        elif child.tag == "group":
+            (required if is_required else optional).add(field_tags[name])
+            collect_fields(child, field_tags, components, required, optional, False)
+        elif child.tag == "component":
+            collect_fields(components[name], field_tags, components, required, optional, is_required)
+
+def parse_schema(path):
+    root = ET.parse(path).getroot()
+
+    field_names = {}
+    field_values = {}
+    for field in root.find("fields"):
+        tag = int(field.get("number"))
+        field_names[tag] = field.get("name")
+        values = {value.get("enum"): value.get("description") for value in field.findall("value")}
+        if values:
+            field_values[tag] = values
+    field_tags = {name: tag for tag, name in field_names.items()}
+
+    components = {}
+    if root.find("components") is not None:
+        components = {component.get("name"): component for component in root.find("components")}
+
+    messages = {}
+    for message in root.find("messages"):
+        required, optional = set(), set()
+        collect_fields(message, field_tags, components, required, optional)
+        messages[message.get("msgtype")] = MessageSchema(message.get("msgtype"), message.get("name"), message.get("msgcat"),
+                                                         frozenset(required), frozenset(optional))
+    return Schema(messages, field_names, field_values)
+
+def load_schema(path="spec/FIX42.xml", cache_path=None):
+    cache_path = cache_path or f"{path}.cache"
+    stat = os.stat(path)
+    key = (CACHE_VERSION, stat.st_size, stat.st_mtime_ns)
+    try:
+        with open(cache_path, "rb") as f:
+            cached_key, schema = pickle.load(f)
+        if cached_key == key:
+            return schema
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError, AttributeError):
+        pass
+
+    schema = parse_schema(path)
+    try:
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump((key, schema), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write schema cache {cache_path}: {e}")
+    return schema
+
+class Route():
+    __slots__ = ("msg_type", "name", "handler", "required", "checks", "optional")
+
+    def __init__(self, message, handler, required):
+        self.msg_type = message.msg_type
+        self.name = message.name
+        self.handler = handler
+        self.required = tuple(sorted(message.required | frozenset(required)))
+        # presence checks run against the raw string, no per-tag parsing
+        self.checks = tuple((tag, f"{__SOH__}{tag}=") for tag in self.required)
+        self.optional = message.optional
+
+    def missing(self, raw):
+        return [tag for tag, needle in self.checks if needle not in raw]
+
+class MessageRegistry():
+    def __init__(self, schema):
+        self.schema = schema
+        self.routes = {}
+
+    def register(self, msg_type, handler, required=()):
+        # required adds tags the handler depends on to the ones the spec requires
+        message = self.schema.messages.get(msg_type)
+        if message is None:
+            raise KeyError(f"MsgType {msg_type} is not in the data dictionary")
+        self.routes[msg_type] = Route(message, handler, required)
+
+    def get(self, msg_type):
+        return self.routes.get(msg_type)
+
+    def describe(self, tags):
+        return ", ".join(f"{tag}={self.schema.field_name(tag)}" for tag in tags)
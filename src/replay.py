@@ -0,0 +1,132 @@
+import os
+import re
+import sys
+import gzip
+import json
+import mmap
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from accounting import Accounting
+from decoder import decode_execution_report, to_epoch_ns
+from model.stats_surface import format_stats
+
+# Offline replay of message.log, the journal, quickfix FileLog files and
+# FileStore .body files. Files are memory mapped and split into chunks that
+# worker processes scan and decode; the parent feeds the decoded orders and
+# ExecutionReports, in file order, through the same Accounting as the live
+# Application.
+
+# a whole FIX message with either SOH or "|" as the separator, ending at CheckSum
+MESSAGE = re.compile(rb"8=FIX\.\d\.\d(?P<sep>[\x01|])[^\n]*?(?P=sep)10=\d{3}(?P=sep)")
+OVERLAP = 64 * 1024
+APP_TYPES = ("8", "D")
+
+def plan_chunks(paths, chunk_size):
+    chunks = []
+    for path in paths:
+        if path.endswith(".gz"):
+            chunks.append((path, 0, None))
+            continue
+        size = os.path.getsize(path)
+        for start in range(0, max(size, 1), chunk_size):
+            chunks.append((path, start, min(start + chunk_size, size)))
+    return chunks
+
+def decode_chunk(chunk):
+    # matches starting in [start, end) belong to this chunk, they may run into the overlap
+    path, start, end = chunk
+    if end is None:
+        with gzip.open(path, "rb") as f:
+            return decode_buffer(f.read(), 0, None)
+    if end <= start:
+        return []
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return decode_buffer(buffer, start, end)
+        finally:
+            buffer.close()
+
+def decode_buffer(buffer, start, end):
+    records = []
+    endpos = len(buffer) if end is None else min(len(buffer), end + OVERLAP)
+    for match in MESSAGE.finditer(buffer, start, endpos):
+        if end is not None and match.start() >= end:
+            break
+        record = decode_execution_report(match.group().decode("latin-1"), chr(match.group("sep")[0]))
+        if record.msg_type in APP_TYPES:
+            record.raw = None
+            records.append(record)
+    return records
+
+def replay(paths, jobs=None, chunk_size=64 * 1024 * 1024, accounting=None):
+    accounting = accounting or Accounting()
+    exec_ids = set()
+    # every order seen, the order book only remembers a bounded number of finished ones
+    cl_ord_ids = set()
+    counts = {"orders": 0, "reports": 0, "duplicates": 0}
+
+    chunks = plan_chunks(paths, chunk_size)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for records in pool.map(decode_chunk, chunks):
+            for record in records:
+                if record.msg_type == "D":
+                    # the journal and the FileStore can both hold the same outbound order
+                    if record.cl_ord_id is None or record.cl_ord_id in cl_ord_ids:
+                        counts["duplicates"] += 1
+                        continue
+                    cl_ord_ids.add(record.cl_ord_id)
+                    price = record.price if record.ord_type == "2" else None
+                    accounting.add_order(record.cl_ord_id, record.symbol, record.side, record.order_qty or 0, price)
+                    counts["orders"] += 1
+                    continue
+
+                if record.exec_id is not None:
+                    if record.exec_id in exec_ids:
+                        counts["duplicates"] += 1
+                        continue
+                    exec_ids.add(record.exec_id)
+                when = record.transact_time or record.sending_time
+                accounting.apply(record, to_epoch_ns(when) if when else None)
+                counts["reports"] += 1
+    return accounting, counts
+
+def summarize(accounting, counts):
+    symbols = {}
+    for symbol, data in accounting.vwap_data.items():
+        position = accounting.portfolio.get(symbol)
+        symbols[symbol] = {"vwap": data["vwap"],
+                           "qty": data["total_qty"],
+                           "notional": data["priceXvol"],
+                           "pnl": position.realised if position else 0.0,
+                           "unrealised_pnl": position.unrealised if position else 0.0,
+                           "position": position.position if position else 0,
+                           "avg_price": position.avg_price if position else 0.0}
+    return {"symbols": symbols,
+            "total_volume": accounting.total_volume,
+            "pnl": accounting.pnl,
+            "unrealised_pnl": accounting.unrealised_pnl,
+            "open_orders": len(accounting.orders),
+            "fills": len(accounting.fills),
+            **counts}
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Rebuild order book, VWAP and PnL from FIX logs')
+    parser.add_argument('files', nargs='+', help='message.log, journal, FileLog or FileStore .body files, oldest first')
+    parser.add_argument('--jobs', type=int, default=None, help='Worker processes, defaults to the CPU count')
+    parser.add_argument('--chunk-size', type=int, default=64, help='Chunk size in MB')
+    parser.add_argument('--json', type=str, default=None, help='Write the summary to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        accounting, counts = replay(args.files, args.jobs, args.chunk_size * 1024 * 1024)
+    except KeyboardInterrupt:
+        sys.exit()
+
+    summary = summarize(accounting, counts)
+    print(format_stats(summary))
+    print(f"Orders: {summary['orders']}, reports: {summary['reports']}, fills: {summary['fills']}, "
+          f"open orders: {summary['open_orders']}, duplicates skipped: {summary['duplicates']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
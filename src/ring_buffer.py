@@ -0,0 +1,140 @@
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger('logger')
+
+# Bounded single-producer/single-consumer ring buffer plus the worker thread
+# that consumes from one or more of them. The producer only moves tail and the
+# consumer only moves head, so neither side takes a lock on the fast path.
+
+BLOCK = "block"      # producer waits for space
+DROP = "drop"        # newest item is dropped and counted
+SPILL = "spill"      # items go to an unbounded overflow queue, order is kept
+
+EMPTY = object()
+
+class RingBuffer():
+    def __init__(self, capacity=65536, overflow=BLOCK, ready=None):
+        if overflow not in (BLOCK, DROP, SPILL):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.capacity = capacity
+        self.overflow = overflow
+        self.slots = [None] * capacity
+        self.head = 0
+        self.tail = 0
+        self.spill = deque()
+        self.ready = ready or threading.Event()
+        self.not_full = threading.Event()
+
+        self.high_water = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.blocked = 0
+
+    def __len__(self):
+        return self.tail - self.head + len(self.spill)
+
+    def put(self, item):
+        # producer side, returns False if the item was dropped
+        if self.spill:
+            # once spilling, later items must queue behind the spilled ones
+            self.spill.append(item)
+            self.spilled += 1
+            self.ready.set()
+            return True
+
+        tail = self.tail
+        if tail - self.head >= self.capacity:
+            if self.overflow == DROP:
+                self.dropped += 1
+                return False
+            if self.overflow == SPILL:
+                self.spill.append(item)
+                self.spilled += 1
+                self.ready.set()
+                return True
+            self.blocked += 1
+            while tail - self.head >= self.capacity:
+                self.not_full.clear()
+                if tail - self.head < self.capacity:
+                    break
+                self.ready.set()
+                self.not_full.wait(0.001)
+
+        self.slots[tail % self.capacity] = item
+        self.tail = tail + 1
+        depth = tail + 1 - self.head
+        if depth > self.high_water:
+            self.high_water = depth
+        self.ready.set()
+        return True
+
+    def get(self):
+        # consumer side, returns EMPTY when there is nothing to read
+        head = self.head
+        if head == self.tail:
+            if self.spill:
+                return self.spill.popleft()
+            return EMPTY
+        index = head % self.capacity
+        item = self.slots[index]
+        self.slots[index] = None
+        self.head = head + 1
+        if self.overflow == BLOCK:
+            self.not_full.set()
+        return item
+
+    def metrics(self):
+        return {"depth": len(self), "high_water": self.high_water, "capacity": self.capacity,
+                "dropped": self.dropped, "spilled": self.spilled, "blocked": self.blocked}
+
+class Worker():
+    # owns all state touched by its handlers; each (ring, handler) pair must
+    # have exactly one producer thread
+    def __init__(self, name="app-worker", batch_size=256, idle_timeout=0.1):
+        self.ready = threading.Event()
+        self.sources = []
+        self.batch_size = batch_size
+        self.idle_timeout = idle_timeout
+        self.running = False
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def add_source(self, capacity, overflow, handler):
+        ring = RingBuffer(capacity, overflow, self.ready)
+        self.sources.append((ring, handler))
+        return ring
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        # pending items are processed before the thread exits
+        self.running = False
+        self.ready.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def run(self):
+        while True:
+            self.ready.clear()
+            processed = self.drain()
+            if not processed:
+                if not self.running:
+                    return
+                self.ready.wait(self.idle_timeout)
+
+    def drain(self):
+        processed = 0
+        for ring, handler in self.sources:
+            for _ in range(self.batch_size):
+                item = ring.get()
+                if item is EMPTY:
+                    break
+                try:
+                    handler(item)
+                except Exception as e:
+                    logger.error(f"Error in worker handler: {e}")
+                processed += 1
+        return processed
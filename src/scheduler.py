@@ -0,0 +1,128 @@
+import time
+import random
+import threading
+
+# Rate controlled order flow. Tokens accrue from the monotonic clock, so time
+# spent inside send_order is paid back instead of stretching the interval the
+# way a fixed sleep does.
+
+class TokenBucket():
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def set_rate(self, rate, now=None):
+        self.refill(time.monotonic() if now is None else now)
+        self.rate = rate
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now=None):
+        # returns 0 if a token was taken, otherwise the seconds until one is available
+        self.refill(time.monotonic() if now is None else now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+class OrderScheduler():
+    def __init__(self, send_order, send_cancel, rate=10.0, burst=1, cancel_ratio=0.1,
+                 max_orders=1000, duration=300, backlog=None, max_backlog=100,
+                 min_rate=1.0, backoff=0.5, recovery=0.5, adjust_interval=0.5, rng=random, ready=None,
+                 max_reject_ratio=0.2):
+        # send_cancel returns False when there is nothing to cancel. Each interval
+        # the rate is cut by backoff when more than max_reject_ratio of the
+        # messages sent in it were rejected or the backlog is too deep, otherwise
+        # it closes recovery of the remaining gap to the target rate.
+        self.send_order = send_order
+        self.send_cancel = send_cancel
+        self.target_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.cancel_ratio = cancel_ratio
+        self.max_orders = max_orders
+        self.duration = duration
+        self.backlog = backlog
+        self.max_backlog = max_backlog
+        self.min_rate = min(min_rate, rate)
+        self.backoff = backoff
+        self.recovery = recovery
+        self.max_reject_ratio = max_reject_ratio
+        self.adjust_interval = adjust_interval
+        self.rng = rng
+        self.ready = ready           # threading.Event, sends pause while it is clear
+
+        self.orders = 0
+        self.cancels = 0
+        self.rejects = 0
+        self.backoffs = 0
+        self.elapsed = 0.0
+        self.reject_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    def on_reject(self):
+        # called from the worker thread, adjust reads the count on the order window thread
+        with self.reject_lock:
+            self.rejects += 1
+
+    def stop(self):
+        self.stopped.set()
+
+    def adjust(self, bucket, now, rejects_seen, sent_seen):
+        # an occasional business reject is not throttling, only back off when a large share of the interval was rejected
+        sent = self.orders + self.cancels - sent_seen
+        rejects = self.rejects - rejects_seen
+        rejecting = rejects > 0 and rejects > self.max_reject_ratio * max(sent, 1)
+        congested = self.backlog is not None and self.backlog() > self.max_backlog
+        if rejecting or congested:
+            self.rate = max(self.min_rate, self.rate * self.backoff)
+            self.backoffs += 1
+        else:
+            self.rate = min(self.target_rate, self.rate + (self.target_rate - self.rate) * self.recovery)
+        bucket.set_rate(self.rate, now)
+        return self.rejects, self.orders + self.cancels
+
+    def run(self):
+        bucket = TokenBucket(self.rate, self.burst)
+        start = time.monotonic()
+        next_adjust = start + self.adjust_interval
+        rejects_seen = self.rejects
+        sent_seen = 0
+
+        while not self.stopped.is_set() and self.orders < self.max_orders:
+            now = time.monotonic()
+            if now - start >= self.duration:
+                break
+            if self.ready is not None and not self.ready.is_set():
+                # session is down, the bucket holds at most burst tokens for the resume
+                self.ready.wait(min(self.adjust_interval, start + self.duration - now))
+                continue
+            if now >= next_adjust:
+                rejects_seen, sent_seen = self.adjust(bucket, now, rejects_seen, sent_seen)
+                next_adjust = now + self.adjust_interval
+
+            wait = bucket.take(now)
+            if wait > 0:
+                self.stopped.wait(min(wait, next_adjust - now, start + self.duration - now))
+                continue
+
+            if self.rng.random() < self.cancel_ratio and self.send_cancel():
+                self.cancels += 1
+            else:
+                self.send_order()
+                self.orders += 1
+
+        self.elapsed = time.monotonic() - start
+        return self.report()
+
+    def achieved_rate(self):
+        return (self.orders + self.cancels) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self):
+        return (f"Scheduler: {self.orders} orders, {self.cancels} cancels in {round(self.elapsed, 3)} s, "
+                f"achieved {round(self.achieved_rate(), 2)} msg/s against target {self.target_rate} msg/s, "
+                f"{self.rejects} rejects, {self.backoffs} backoffs")
@@ -0,0 +1,276 @@
+import sys
+import time
+import heapq
+import random
+import argparse
+import itertools
+import threading
+from datetime import datetime
+import quickfix as fix
+
+# Local stand-in for the DTL counterparty. Answers NewOrderSingle and
+# OrderCancelRequest using the same FIX42.xml dictionary as the client.
+
+MARKET_PRICES = {"MSFT": 150.0, "AAPL": 150.0, "BAC": 150.0}
+
+class Simulator(fix.Application):
+    def __init__(self, ack_delay=0.0, fill_delay=0.0, reject_ratio=0.0,
+                 fill_ratio=0.5, partial_ratio=0.3, partial_fills=2, seed=None):
+        super().__init__()
+        self.ack_delay = ack_delay
+        self.fill_delay = fill_delay
+        self.reject_ratio = reject_ratio
+        self.fill_ratio = fill_ratio
+        self.partial_ratio = partial_ratio
+        self.partial_fills = max(1, partial_fills)
+        self.random = random.Random(seed)
+        self.orders = {}
+        self.order_ids = itertools.count(1)
+        self.exec_ids = itertools.count(1)
+        self.received = 0
+        self.sent = 0
+
+        # delayed responses are released by a single timer thread
+        self.queue = []
+        self.queue_seq = itertools.count()
+        self.queue_cond = threading.Condition()
+        self.running = True
+        self.timer = threading.Thread(target=self.run_timer, name="simulator-timer", daemon=True)
+        self.timer.start()
+
+    def onCreate(self, sessionID):
+        print("onCreate : Session (%s)" % sessionID.toString())
+        return
+
+    def onLogon(self, sessionID):
+        print("Client logged on to session '%s'." % sessionID.toString())
+        return
+
+    def onLogout(self, sessionID):
+        print("Session (%s) logout !" % sessionID.toString())
+        return
+
+    def toAdmin(self, message, sessionID):
+        return
+
+    def fromAdmin(self, message, sessionID):
+        return
+
+    def toApp(self, message, sessionID):
+        return
+
+    def fromApp(self, message, sessionID):
+        self.received += 1
+        msgType = fix.MsgType()
+        message.getHeader().getField(msgType)
+
+        if msgType.getValue() == fix.MsgType_NewOrderSingle:
+            self.on_new_order(message, sessionID)
+        elif msgType.getValue() == fix.MsgType_OrderCancelRequest:
+            self.on_cancel(message, sessionID)
+        elif msgType.getValue() == fix.MsgType_OrderCancelReplaceRequest:
+            self.on_replace(message, sessionID)
+        return
+
+    def stop(self):
+        with self.queue_cond:
+            self.running = False
+            self.queue_cond.notify()
+        self.timer.join()
+
+    def schedule(self, delay, fn, *args):
+        if delay <= 0:
+            fn(*args)
+            return
+        with self.queue_cond:
+            heapq.heappush(self.queue, (time.monotonic() + delay, next(self.queue_seq), fn, args))
+            self.queue_cond.notify()
+
+    def run_timer(self):
+        while True:
+            with self.queue_cond:
+                while self.running and (not self.queue or self.queue[0][0] > time.monotonic()):
+                    timeout = self.queue[0][0] - time.monotonic() if self.queue else None
+                    self.queue_cond.wait(timeout)
+                if not self.running:
+                    return
+                _, _, fn, args = heapq.heappop(self.queue)
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"Error in simulator timer: {e}")
+
+    def on_new_order(self, message, sessionID):
+        ord_type = self.get(message, fix.OrdType())
+        symbol = self.get(message, fix.Symbol())
+        price = float(self.get(message, fix.Price()) or 0.0)
+        if ord_type == fix.OrdType_LIMIT and price > 0:
+            MARKET_PRICES[symbol] = price
+
+        order = {"cl_ord_id": self.get(message, fix.ClOrdID()),
+                 "order_id": str(next(self.order_ids)),
+                 "symbol": symbol,
+                 "side": self.get(message, fix.Side()),
+                 "ord_type": ord_type,
+                 "order_qty": int(float(self.get(message, fix.OrderQty()) or 0)),
+                 "price": price if ord_type == fix.OrdType_LIMIT else MARKET_PRICES.get(symbol, 150.0),
+                 "cum_qty": 0,
+                 "avg_px": 0.0,
+                 "open": True}
+
+        if self.random.random() < self.reject_ratio:
+            order["open"] = False
+            self.schedule(self.ack_delay, self.send_report, order, sessionID,
+                          fix.ExecType_REJECTED, fix.OrdStatus_REJECTED)
+            return
+
+        self.orders[order["cl_ord_id"]] = order
+        self.schedule(self.ack_delay, self.send_report, order, sessionID,
+                      fix.ExecType_NEW, fix.OrdStatus_NEW)
+
+        # market orders always trade, limit orders rest unless they are picked to fill
+        if ord_type != fix.OrdType_LIMIT or self.random.random() < self.fill_ratio:
+            if self.random.random() < self.partial_ratio and order["order_qty"] > 1:
+                slices = min(self.partial_fills + 1, order["order_qty"])
+            else:
+                slices = 1
+            remaining = order["order_qty"]
+            for i in range(slices):
+                qty = remaining if i == slices - 1 else max(1, order["order_qty"] // slices)
+                remaining -= qty
+                self.schedule(self.ack_delay + self.fill_delay * (i + 1), self.send_fill, order, sessionID, qty)
+
+    def on_cancel(self, message, sessionID):
+        cl_ord_id = self.get(message, fix.ClOrdID())
+        orig_cl_ord_id = self.get(message, fix.OrigClOrdID())
+        order = self.orders.get(orig_cl_ord_id)
+
+        if order is None or not order["open"]:
+            self.schedule(self.ack_delay, self.send_cancel_reject, cl_ord_id, orig_cl_ord_id, order, sessionID)
+            return
+
+        order["open"] = False
+        self.schedule(self.ack_delay, self.send_report, order, sessionID,
+                      fix.ExecType_CANCELED, fix.OrdStatus_CANCELED, 0, 0.0, cl_ord_id, orig_cl_ord_id)
+
+    def on_replace(self, message, sessionID):
+        cl_ord_id = self.get(message, fix.ClOrdID())
+        orig_cl_ord_id = self.get(message, fix.OrigClOrdID())
+        order = self.orders.get(orig_cl_ord_id)
+        order_qty = int(float(self.get(message, fix.OrderQty()) or 0))
+
+        if order is None or not order["open"] or order_qty <= order["cum_qty"]:
+            self.schedule(self.ack_delay, self.send_cancel_reject, cl_ord_id, orig_cl_ord_id, order, sessionID,
+                          fix.CxlRejResponseTo_ORDER_CANCEL_REPLACE_REQUEST)
+            return
+
+        del self.orders[orig_cl_ord_id]
+        order["cl_ord_id"] = cl_ord_id
+        order["order_qty"] = order_qty
+        price = self.get(message, fix.Price())
+        if price is not None and order["ord_type"] == fix.OrdType_LIMIT:
+            order["price"] = float(price)
+        self.orders[cl_ord_id] = order
+        ord_status = fix.OrdStatus_PARTIALLY_FILLED if order["cum_qty"] else fix.OrdStatus_NEW
+        self.schedule(self.ack_delay, self.send_report, order, sessionID,
+                      fix.ExecType_REPLACED, ord_status, 0, 0.0, cl_ord_id, orig_cl_ord_id)
+
+    def send_fill(self, order, sessionID, qty):
+        if not order["open"]:
+            return
+        last_px = order["price"]
+        order["avg_px"] = ((order["avg_px"] * order["cum_qty"]) + (last_px * qty)) / (order["cum_qty"] + qty)
+        order["cum_qty"] += qty
+        if order["cum_qty"] >= order["order_qty"]:
+            order["open"] = False
+            del self.orders[order["cl_ord_id"]]
+            self.send_report(order, sessionID, fix.ExecType_FILL, fix.OrdStatus_FILLED, qty, last_px)
+        else:
+            self.send_report(order, sessionID, fix.ExecType_PARTIAL_FILL, fix.OrdStatus_PARTIALLY_FILLED, qty, last_px)
+
+    def send_report(self, order, sessionID, exec_type, ord_status, last_shares=0, last_px=0.0,
+                    cl_ord_id=None, orig_cl_ord_id=None):
+        message = fix.Message()
+        message.getHeader().setField(fix.MsgType(fix.MsgType_ExecutionReport))
+
+        message.setField(fix.OrderID(order["order_id"]))
+        message.setField(fix.ExecID(str(next(self.exec_ids))))
+        message.setField(fix.ExecTransType(fix.ExecTransType_NEW))
+        message.setField(fix.ExecType(exec_type))
+        message.setField(fix.OrdStatus(ord_status))
+        message.setField(fix.ClOrdID(cl_ord_id or order["cl_ord_id"]))
+        if orig_cl_ord_id:
+            message.setField(fix.OrigClOrdID(orig_cl_ord_id))
+        message.setField(fix.Symbol(order["symbol"]))
+        message.setField(fix.Side(order["side"]))
+        message.setField(fix.OrderQty(order["order_qty"]))
+        message.setField(fix.OrdType(order["ord_type"]))
+        message.setField(fix.Price(order["price"]))
+        message.setField(fix.LastShares(last_shares))
+        message.setField(fix.LastPx(last_px))
+        leaves_qty = order["order_qty"] - order["cum_qty"] if order["open"] else 0
+        message.setField(fix.LeavesQty(leaves_qty))
+        message.setField(fix.CumQty(order["cum_qty"]))
+        message.setField(fix.AvgPx(order["avg_px"]))
+        trstime = fix.TransactTime()
+        trstime.setString(datetime.utcnow().strftime("%Y%m%d-%H:%M:%S.%f")[:-3])
+        message.setField(trstime)
+
+        fix.Session.sendToTarget(message, sessionID)
+        self.sent += 1
+
+    def send_cancel_reject(self, cl_ord_id, orig_cl_ord_id, order, sessionID,
+                           response_to=fix.CxlRejResponseTo_ORDER_CANCEL_REQUEST):
+        message = fix.Message()
+        message.getHeader().setField(fix.MsgType(fix.MsgType_OrderCancelReject))
+
+        message.setField(fix.OrderID(order["order_id"] if order else "NONE"))
+        message.setField(fix.ClOrdID(cl_ord_id))
+        message.setField(fix.OrigClOrdID(orig_cl_ord_id))
+        message.setField(fix.OrdStatus(fix.OrdStatus_FILLED if order else fix.OrdStatus_REJECTED))
+        message.setField(fix.CxlRejResponseTo(response_to))
+        message.setField(fix.CxlRejReason(fix.CxlRejReason_TOO_LATE_TO_CANCEL if order else fix.CxlRejReason_UNKNOWN_ORDER))
+
+        fix.Session.sendToTarget(message, sessionID)
+        self.sent += 1
+
+    def get(self, message, field):
+        if message.isSetField(field.getField()):
+            message.getField(field)
+            return field.getString()
+        return None
+
+if __name__=='__main__':
+    parser = argparse.ArgumentParser(description='Local FIX acceptor simulator')
+    parser.add_argument('file_name', type=str, help='Name of configuration file')
+    parser.add_argument('--ack-delay', type=float, default=0.0, help='Seconds before an order is acknowledged')
+    parser.add_argument('--fill-delay', type=float, default=0.0, help='Seconds between acknowledgement and each fill')
+    parser.add_argument('--reject-ratio', type=float, default=0.0, help='Fraction of orders rejected')
+    parser.add_argument('--fill-ratio', type=float, default=0.5, help='Fraction of limit orders that fill')
+    parser.add_argument('--partial-ratio', type=float, default=0.3, help='Fraction of fills split into partial fills')
+    parser.add_argument('--partial-fills', type=int, default=2, help='Number of partial fills before the final fill')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible runs')
+    args = parser.parse_args()
+
+    try:
+        settings = fix.SessionSettings(args.file_name)
+        application = Simulator(args.ack_delay, args.fill_delay, args.reject_ratio,
+                                args.fill_ratio, args.partial_ratio, args.partial_fills, args.seed)
+        storeFactory = fix.FileStoreFactory(settings)
+        logFactory = fix.ScreenLogFactory(False, False, False)
+        acceptor = fix.SocketAcceptor(application, storeFactory, settings, logFactory)
+
+        acceptor.start()
+        print("Simulator running, press Ctrl-C to stop")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        acceptor.stop()
+        application.stop()
+        print(f"Received {application.received} messages, sent {application.sent} messages")
+
+    except (fix.ConfigError, fix.RuntimeError) as e:
+        print(e)
+        sys.exit()
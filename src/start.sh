@@ -1,3 +1,2 @@
-cd ./src
-sleep 5
-python client.py client.cfg
\ No newline at end of file
+cd "$(dirname "$0")"
+python application.py client.cfg "$@"
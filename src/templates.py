@@ -0,0 +1,105 @@
+import os
+import time
+import itertools
+import quickfix as fix
+
+# Outbound message templates. The invariant fields of NewOrderSingle,
+# OrderCancelRequest and OrderCancelReplaceRequest are set once; each send only patches the variable tags
+# with (tag, string) setField calls, which skips building a quickfix field
+# object per tag. Templates are reused, so use one per sending thread.
+
+# tag numbers, looked up once
+CL_ORD_ID = fix.ClOrdID().getField()
+ORD_TYPE = fix.OrdType().getField()
+ORDER_QTY = fix.OrderQty().getField()
+ORIG_CL_ORD_ID = fix.OrigClOrdID().getField()
+PRICE = fix.Price().getField()
+SIDE = fix.Side().getField()
+SYMBOL = fix.Symbol().getField()
+TRANSACT_TIME = fix.TransactTime().getField()
+
+class TimestampFormatter():
+    # UTCTimestamp with milliseconds, the date/time part is formatted once per second
+    def __init__(self):
+        self.second = None
+        self.prefix = ""
+
+    def now(self):
+        t = time.time()
+        second = int(t)
+        if second != self.second:
+            self.second = second
+            self.prefix = time.strftime("%Y%m%d-%H:%M:%S", time.gmtime(second))
+        return f"{self.prefix}.{int((t - second) * 1000):03d}"
+
+class ClOrdIDGenerator():
+    # start time and pid make the prefix unique per process, the counter makes
+    # ids unique within it regardless of how many are sent per millisecond
+    def __init__(self, prefix=None):
+        if prefix is None:
+            prefix = f"{time.strftime('%Y%m%d%H%M%S')}{os.getpid() % 100000:05d}"
+        self.prefix = prefix
+        self.counter = itertools.count(1)
+
+    def next(self):
+        return f"{self.prefix}-{next(self.counter)}"
+
+class NewOrderSingleTemplate():
+    def __init__(self):
+        self.message = fix.Message()
+        self.message.getHeader().setField(fix.MsgType(fix.MsgType_NewOrderSingle))
+        self.message.setField(fix.HandlInst("1"))
+        self.message.setField(fix.TimeInForce('0'))
+        self.message.setField(fix.Text("NewOrderSingle"))
+
+    def build(self, cl_ord_id, side, symbol, order_qty, ord_type, price, transact_time):
+        message = self.message
+        message.setField(CL_ORD_ID, cl_ord_id)
+        message.setField(SIDE, side)
+        message.setField(SYMBOL, symbol)
+        message.setField(ORDER_QTY, str(order_qty))
+        message.setField(ORD_TYPE, ord_type)
+        if price is None:
+            message.removeField(PRICE)
+        else:
+            message.setField(PRICE, f"{price:.15g}")
+        message.setField(TRANSACT_TIME, transact_time)
+        return message
+
+class OrderCancelRequestTemplate():
+    def __init__(self):
+        self.message = fix.Message()
+        self.message.getHeader().setField(fix.MsgType(fix.MsgType_OrderCancelRequest))
+        self.message.setField(fix.Text("OrderCancelRequest"))
+
+    def build(self, cl_ord_id, orig_cl_ord_id, symbol, side, transact_time):
+        message = self.message
+        message.setField(CL_ORD_ID, cl_ord_id)
+        message.setField(ORIG_CL_ORD_ID, orig_cl_ord_id)
+        message.setField(SYMBOL, symbol)
+        message.setField(SIDE, side)
+        message.setField(TRANSACT_TIME, transact_time)
+        return message
+
+class OrderCancelReplaceRequestTemplate():
+    def __init__(self):
+        self.message = fix.Message()
+        self.message.getHeader().setField(fix.MsgType(fix.MsgType_OrderCancelReplaceRequest))
+        self.message.setField(fix.HandlInst("1"))
+        self.message.setField(fix.TimeInForce('0'))
+        self.message.setField(fix.Text("OrderCancelReplaceRequest"))
+
+    def build(self, cl_ord_id, orig_cl_ord_id, symbol, side, order_qty, ord_type, price, transact_time):
+        message = self.message
+        message.setField(CL_ORD_ID, cl_ord_id)
+        message.setField(ORIG_CL_ORD_ID, orig_cl_ord_id)
+        message.setField(SYMBOL, symbol)
+        message.setField(SIDE, side)
+        message.setField(ORDER_QTY, str(order_qty))
+        message.setField(ORD_TYPE, ord_type)
+        if price is None:
+            message.removeField(PRICE)
+        else:
+            message.setField(PRICE, f"{price:.15g}")
+        message.setField(TRANSACT_TIME, transact_time)
+        return message